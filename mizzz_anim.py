@@ -0,0 +1,98 @@
+"""Time-based tweens that drive the animations of the game.
+
+An Animator holds the running tweens and is advanced once per frame by
+the main loop with the current time in milliseconds. A tween calls its
+update function with the eased progress 0..1 and, when it reaches 1, its
+on_done callback, which may start the next tween. Sequences such as the
+swap/match/fall cascade are chains of these callbacks, so nothing blocks
+the loop and any number of tweens can run at the same time.
+"""
+
+
+def linear(t):
+    return t
+
+
+class Tween:
+    def __init__(self, duration, update=None, on_done=None, ease=linear):
+        self.duration = duration
+        self.update = update
+        self.on_done = on_done
+        self.ease = ease
+        self.elapsed = 0.0
+        self.started = False
+        self.done = False
+
+    def advance(self, dt):
+        if self.done:
+            return
+        self.elapsed += dt
+        t = 1.0 if self.duration <= 0 else min(1.0, self.elapsed / self.duration)
+        if self.update:
+            self.update(self.ease(t))
+        if t >= 1.0:
+            self._complete()
+
+    def finish(self):
+        """Jump to the end: final update, then on_done."""
+        if self.done:
+            return
+        if self.update:
+            self.update(self.ease(1.0))
+        self._complete()
+
+    def _complete(self):
+        self.done = True
+        if self.on_done:
+            self.on_done()
+
+
+class Animator:
+    """The running tweens; speed scales the time they see (2.0 = twice as fast)."""
+
+    def __init__(self, speed=1.0):
+        self.speed = speed
+        self.tweens = []
+        self.now = None
+
+    @property
+    def active(self):
+        return bool(self.tweens)
+
+    def start(self, tween):
+        self.tweens.append(tween)
+        return tween
+
+    def tween(self, duration, update=None, on_done=None, ease=linear):
+        return self.start(Tween(duration, update, on_done, ease))
+
+    def delay(self, duration, on_done):
+        return self.start(Tween(duration, on_done=on_done))
+
+    def cancel(self, tween):
+        """Stop a tween without calling its on_done."""
+        if tween in self.tweens:
+            tween.done = True
+            self.tweens.remove(tween)
+
+    def update(self, now):
+        """Advance all tweens to time now (ms).
+
+        A tween started since the last call begins at its first update, so
+        a long pause before it (e.g. while waiting for input) is not counted.
+        """
+        dt = 0.0 if self.now is None else (now - self.now) * self.speed
+        self.now = now
+        for tween in list(self.tweens):
+            tween.advance(dt if tween.started else 0.0)
+            tween.started = True
+        self.tweens = [t for t in self.tweens if not t.done]
+
+    def finish_all(self, max_rounds=10000):
+        """Run all tweens, and the ones their callbacks start, to the end right now."""
+        rounds = 0
+        while self.tweens and rounds < max_rounds:
+            for tween in list(self.tweens):
+                tween.finish()
+            self.tweens = [t for t in self.tweens if not t.done]
+            rounds += 1
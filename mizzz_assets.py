@@ -0,0 +1,137 @@
+"""Loading and scaling of the game images.
+
+AssetLoader decodes and scales images on a thread pool and keeps the
+scaled pixels in a cache directory, keyed by a hash of the source file,
+the target size and the smooth flag. On the next start at the same
+resolution the cached raw buffer is memory-mapped instead of decoding the
+PNG and running smoothscale again. The cache holds one entry per source
+file name: storing a new one removes the entries of that file with an
+older key (other size, changed image).
+
+The workers only produce pixel buffers; surface() turns one into a
+display-format Surface on the main thread, since convert() needs the
+display.
+"""
+import hashlib
+import io
+import logging
+import os
+import struct
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pygame
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def png_size(data):
+    """(width, height) from the header of PNG data, or None for other formats."""
+    if data[:8] != PNG_SIGNATURE or len(data) < 24:
+        return None
+    return struct.unpack('>II', data[16:24])
+
+
+class AssetLoader:
+    """Thread pool plus disk cache for scaled images.
+
+    size is either a (width, height) tuple or a function that gets the
+    source size and returns the target size. Results are only cached when
+    the source size can be read from the file header (PNG); other formats
+    are always decoded.
+    """
+
+    def __init__(self, cache_dir, smooth=True, max_workers=None):
+        self.cache_dir = cache_dir
+        self.smooth = smooth
+        self.hits = 0
+        self.misses = 0
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            logging.error(f'Asset cache disabled, cannot create {cache_dir}: {e}')
+            self.cache_dir = None
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='assets')
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def submit(self, path, size, alpha=True):
+        """Start loading path; the future resolves to the (height, width, channels) pixel array."""
+        return self._pool.submit(self._load, path, size, alpha)
+
+    def surface(self, future):
+        """Wait for a submit() result and make a display-format Surface of it."""
+        pixels = future.result()
+        height, width, channels = pixels.shape
+        img = pygame.image.frombuffer(pixels, (width, height), 'RGBA' if channels == 4 else 'RGB')
+        return img.convert_alpha() if channels == 4 else img.convert()
+
+    def cache_path(self, name, digest, size, alpha):
+        mode = 'smooth' if self.smooth else 'scale'
+        return os.path.join(self.cache_dir,
+                            f'{name}-{digest}-{size[0]}x{size[1]}-{mode}-{"rgba" if alpha else "rgb"}.npy')
+
+    def _load(self, path, size, alpha):
+        with open(path, 'rb') as f:
+            data = f.read()
+        source_size = png_size(data)
+        cache_path = None
+        if self.cache_dir and source_size:
+            target = size(source_size) if callable(size) else size
+            digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+            name = os.path.splitext(os.path.basename(path))[0]
+            cache_path = self.cache_path(name, digest, target, alpha)
+            try:
+                pixels = np.load(cache_path, mmap_mode='r')
+                self.hits += 1
+                return pixels
+            except (OSError, ValueError):
+                pass
+        self.misses += 1
+        pixels = self._decode(data, path, size, alpha)
+        if cache_path and self._store(cache_path, pixels):
+            self._prune(cache_path, name)
+        return pixels
+
+    def _decode(self, data, path, size, alpha):
+        img = pygame.image.load(io.BytesIO(data), os.path.basename(path))
+        # Auf 24/32 Bit bringen (smoothscale kann keine Paletten-Bilder),
+        # ohne convert(), das nur mit Display und im Hauptthread geht
+        mode = 'RGBA' if alpha else 'RGB'
+        img = pygame.image.frombytes(pygame.image.tobytes(img, mode), img.get_size(), mode)
+        target = size(img.get_size()) if callable(size) else size
+        scale = pygame.transform.smoothscale if self.smooth else pygame.transform.scale
+        img = scale(img, target)
+        raw = pygame.image.tobytes(img, mode)
+        return np.frombuffer(raw, dtype=np.uint8).reshape(target[1], target[0], len(mode))
+
+    def _store(self, cache_path, pixels):
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, pixels)
+            os.replace(tmp_path, cache_path)
+            return True
+        except OSError as e:
+            logging.error(f'Error writing asset cache {cache_path}: {e}')
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return False
+
+    def _prune(self, keep, name):
+        """Remove the cache entries of name other than keep."""
+        try:
+            files = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for filename in files:
+            # name-digest-WxH-mode-channels.npy; name kann selbst '-' enthalten
+            if (filename.endswith('.npy') and filename.rsplit('-', 4)[0] == name
+                    and filename != os.path.basename(keep)):
+                try:
+                    os.unlink(os.path.join(self.cache_dir, filename))
+                except OSError as e:
+                    logging.error(f'Error removing stale asset cache {filename}: {e}')
@@ -0,0 +1,288 @@
+"""Background music and sound effects.
+
+MusicPlayer plays the mp3 files of a directory one after another. A
+background thread rescans the directory, reads and checks the next track
+ahead of time and keeps recently played tracks in memory, so the hand-off
+to pygame.mixer.music on the main thread is a load from a memory buffer
+instead of a file open on a possibly slow disk.
+
+SoundEffects plays the short effects on a fixed set of reserved mixer
+channels, so long cascades cannot starve each other or the voice clips.
+"""
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pygame
+
+# Anfänge gültiger Dateien: ID3-Tag, MPEG-Frame-Sync, Ogg, RIFF/WAV, FLAC
+AUDIO_MAGIC = (b'ID3', b'OggS', b'RIFF', b'fLaC')
+
+
+def looks_like_audio(data):
+    if data.startswith(AUDIO_MAGIC):
+        return True
+    return len(data) >= 2 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0
+
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class MusicPlayer:
+    """Playlist of a directory, played through pygame.mixer.music.
+
+    Call start() once and update() every frame; update() starts the next
+    track when the current one has ended and never waits for the disk. If
+    the next track is not in memory yet, it starts on a later frame. With
+    end_event, pygame posts that event type when a track ends, and the
+    background thread posts it when the next track is in memory, so a loop
+    sleeping in pygame.event.wait() wakes up to call update().
+    """
+
+    def __init__(self, directory, extensions=('.mp3',), rescan_interval=10.0, cache_bytes=64 * 1024 * 1024,
+                 end_event=None):
+        self.directory = directory
+        self.end_event = end_event
+        self.extensions = extensions
+        self.rescan_interval = rescan_interval
+        self.cache_bytes = cache_bytes
+        self.tracks = []
+        self.current = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_index = 0
+        self._ready = None
+        self._bad = {}
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._buffer = None
+        self._stopped = False
+
+    def start(self):
+        """Scan the directory and start the background thread."""
+        if self.end_event is not None:
+            pygame.mixer.music.set_endevent(self.end_event)
+        self.rescan()
+        if self.tracks:
+            logging.debug(f'Loaded music files: {self.tracks}')
+        else:
+            logging.warning('No music files found')
+        self._thread = threading.Thread(target=self._worker, name='music', daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+
+    def rescan(self):
+        try:
+            names = sorted(f for f in os.listdir(self.directory) if f.lower().endswith(self.extensions))
+        except OSError as e:
+            logging.error(f'Error scanning {self.directory}: {e}')
+            names = []
+        tracks = [os.path.join(self.directory, f) for f in names]
+        with self._lock:
+            if tracks != self.tracks:
+                logging.debug(f'Music playlist changed: {tracks}')
+                self.tracks = tracks
+                # Nächsten Titel nach der neuen Liste bestimmen
+                self._ready = None
+                self._next_index = tracks.index(self.current) + 1 if self.current in tracks else 0
+
+    def update(self):
+        """Per frame: start the prefetched next track once the current one has ended."""
+        if self._stopped or not self.tracks or pygame.mixer.music.get_busy():
+            return
+        self._play_ready()
+
+    def skip(self):
+        """Stop the current track and continue with the next one."""
+        pygame.mixer.music.stop()
+        self._stopped = False
+        self._play_ready()
+
+    def stop(self, fadeout_ms=0):
+        """Stop playback for good (update() will not restart it)."""
+        self._stopped = True
+        if fadeout_ms:
+            pygame.mixer.music.fadeout(fadeout_ms)
+        else:
+            pygame.mixer.music.stop()
+
+    def _play_ready(self):
+        with self._lock:
+            ready, self._ready = self._ready, None
+            if ready is not None:
+                path, data = ready
+                self._next_index = self.tracks.index(path) + 1 if path in self.tracks else 0
+        if ready is None:
+            # Der Worker meldet sich, sobald ein Titel bereit ist
+            return False
+        buffer = io.BytesIO(data)
+        try:
+            pygame.mixer.music.load(buffer, os.path.basename(path))
+            pygame.mixer.music.play()
+        except pygame.error as e:
+            logging.error(f'Error playing music {path}: {e}')
+            with self._lock:
+                self._bad[path] = file_stamp(path)
+            self._wake.set()
+            return False
+        # Der Worker soll schon den übernächsten Titel vorbereiten
+        self._wake.set()
+        # SDL liest während der Wiedergabe aus dem Puffer
+        self._buffer = buffer
+        self.current = path
+        logging.debug(f'Playing music: {path}')
+        return True
+
+    def _worker(self):
+        next_scan = time.monotonic() + self.rescan_interval
+        while not self._stop.is_set():
+            if time.monotonic() >= next_scan:
+                self.rescan()
+                next_scan = time.monotonic() + self.rescan_interval
+            self._prefetch()
+            self._wake.wait(max(0.0, next_scan - time.monotonic()))
+            self._wake.clear()
+
+    def _prefetch(self):
+        """Read the next playable track into memory unless it is there already."""
+        with self._lock:
+            if self._ready is not None:
+                return
+            tracks = self.tracks
+            start = self._next_index
+        for i in range(len(tracks)):
+            path = tracks[(start + i) % len(tracks)]
+            stamp = file_stamp(path)
+            if stamp is None or self._bad.get(path) == stamp:
+                continue
+            data = self._read(path, stamp)
+            if data is None:
+                with self._lock:
+                    self._bad[path] = stamp
+                continue
+            with self._lock:
+                if path not in self.tracks:
+                    return
+                self._ready = (path, data)
+            if self.end_event is not None:
+                pygame.event.post(pygame.event.Event(self.end_event))
+            return
+
+    def _read(self, path, stamp):
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            self._cache.move_to_end(path)
+            return cached[1]
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            logging.error(f'Error reading music {path}: {e}')
+            return None
+        if not looks_like_audio(data):
+            logging.warning(f'Not an audio file: {path}')
+            return None
+        if cached is not None:
+            self._cached_bytes -= len(cached[1])
+        self._cache[path] = (stamp, data)
+        self._cache.move_to_end(path)
+        self._cached_bytes += len(data)
+        while len(self._cache) > 1 and self._cached_bytes > self.cache_bytes:
+            _, (_, old) = self._cache.popitem(last=False)
+            self._cached_bytes -= len(old)
+        return data
+
+
+class SoundEffects:
+    """Sound effects on reserved mixer channels, one pool per category.
+
+    Effects of one category only compete with each other. When a pool is
+    full, a new effect replaces the lowest-priority (then oldest) effect
+    that is playing, provided that one's priority is not higher than its
+    own. Otherwise the new effect is dropped. The same effect is played at
+    most once per min_interval_ms, so a cascade that triggers it many
+    times in one frame produces one sound.
+    """
+
+    def __init__(self, pools, min_interval_ms=16):
+        self.min_interval_ms = min_interval_ms
+        total = sum(pools.values())
+        if pygame.mixer.get_num_channels() < total:
+            pygame.mixer.set_num_channels(total)
+        # Reservierte Kanäle werden von Sound.play() ohne Kanal nie belegt
+        pygame.mixer.set_reserved(total)
+        self.pools = {}
+        first = 0
+        for category, count in pools.items():
+            self.pools[category] = [pygame.mixer.Channel(i) for i in range(first, first + count)]
+            first += count
+        self.effects = {}
+        self.playing = {}
+        self.last_played = {}
+        self.dropped = 0
+
+    def load(self, name, path, category, priority=0):
+        """Load a sound file once; returns False if it is missing or unreadable."""
+        if not os.path.isfile(path):
+            logging.warning(f'Sound file not found: {path}')
+            return False
+        try:
+            sound = pygame.mixer.Sound(path)
+        except pygame.error as e:
+            logging.error(f'Error loading sound {path}: {e}')
+            return False
+        self.effects[name] = (sound, category, priority)
+        logging.debug(f'Loaded sound: {path}')
+        return True
+
+    def play(self, name):
+        """Play an effect; returns the channel, or None if it was skipped."""
+        effect = self.effects.get(name)
+        if effect is None:
+            return None
+        sound, category, priority = effect
+        now = pygame.time.get_ticks()
+        if now - self.last_played.get(name, -self.min_interval_ms) < self.min_interval_ms:
+            return None
+        channel = self._channel(category, priority)
+        if channel is None:
+            self.dropped += 1
+            return None
+        channel.play(sound)
+        self.playing[channel] = (name, priority, now)
+        self.last_played[name] = now
+        return channel
+
+    def _channel(self, category, priority):
+        pool = self.pools[category]
+        for channel in pool:
+            if not channel.get_busy():
+                return channel
+        # Alle belegt: niedrigste Priorität, bei Gleichstand den ältesten verdrängen
+        victim = min(pool, key=lambda c: self.playing.get(c, (None, -1, 0))[1:])
+        if self.playing.get(victim, (None, -1, 0))[1] > priority:
+            return None
+        victim.stop()
+        return victim
+
+    def stop(self, name):
+        for channel, (playing_name, _, _) in list(self.playing.items()):
+            if playing_name == name:
+                channel.stop()
+                del self.playing[channel]
+
+    def has(self, name):
+        return name in self.effects
@@ -0,0 +1,119 @@
+"""Bitboard representation of a mizzz bloxxxx board.
+
+Every block type gets one occupancy bitmask (a Python int). Cell (y, x) is
+bit y*stride + x with stride = size + 1: the extra column is always empty,
+so shifting a row by one or two bits never carries into the next row.
+Runs of 3 and "one swap away" patterns are then a few shifts and ANDs per
+block type, independent of the board size.
+"""
+import functools
+
+import numpy as np
+
+
+@functools.lru_cache(maxsize=None)
+def cell_bits(size):
+    """Bitmask with one bit set for every real cell of a size x size board."""
+    stride = size + 1
+    row = (1 << size) - 1
+    return sum(row << (y * stride) for y in range(size))
+
+
+def int_to_mask(bits, size):
+    """Unpack a bitmask into a (size, size) boolean array."""
+    stride = size + 1
+    nbytes = (size * stride + 7) // 8
+    flat = np.unpackbits(np.frombuffer(bits.to_bytes(nbytes, 'little'), dtype=np.uint8), bitorder='little')
+    return flat[:size * stride].reshape(size, stride)[:, :size].astype(bool)
+
+
+def mask_to_int(mask):
+    """Pack a (size, size) boolean array into a bitmask."""
+    size = mask.shape[0]
+    padded = np.zeros((size, size + 1), dtype=bool)
+    padded[:, :size] = mask
+    return int.from_bytes(np.packbits(padded.ravel(), bitorder='little').tobytes(), 'little')
+
+
+class BitBoard:
+    def __init__(self, size, num_types):
+        self.size = size
+        self.num_types = num_types
+        self.stride = size + 1
+        self.valid = cell_bits(size)
+        self.bits = [0] * num_types
+
+    @classmethod
+    def from_grid(cls, grid, num_types):
+        """Build from a (size, size) array; values outside 0..num_types-1 are empty cells."""
+        bb = cls(len(grid), num_types)
+        bb.bits = [mask_to_int(grid == t) for t in range(num_types)]
+        return bb
+
+    def copy(self):
+        other = BitBoard(self.size, self.num_types)
+        other.bits = self.bits[:]
+        return other
+
+    def bit(self, pos):
+        return 1 << (pos[0] * self.stride + pos[1])
+
+    def swap(self, pos1, pos2):
+        both = self.bit(pos1) | self.bit(pos2)
+        for t, bits in enumerate(self.bits):
+            hit = bits & both
+            # Nur Typen, die genau eine der beiden Zellen belegen, ändern sich
+            if hit and hit != both:
+                self.bits[t] = bits ^ both
+
+    def clear(self, cells):
+        keep = ~sum(self.bit(pos) for pos in cells)
+        self.bits = [bits & keep for bits in self.bits]
+
+    def match_bits(self):
+        """Bitmask of all cells in a horizontal or vertical run of 3+."""
+        s = self.stride
+        matched = 0
+        for b in self.bits:
+            h = b & (b >> 1) & (b >> 2)
+            v = b & (b >> s) & (b >> 2 * s)
+            matched |= h | (h << 1) | (h << 2) | v | (v << s) | (v << 2 * s)
+        return matched
+
+    def move_bits(self):
+        """Return (horizontal, vertical) bitmasks of legal moves.
+
+        A horizontal move is stored on its left cell, a vertical one on its
+        top cell. A move is legal when a block moved into a cell completes a
+        line of three with two equal blocks that are not the swapped ones.
+        """
+        s = self.stride
+        valid = self.valid
+        horizontal = 0
+        vertical = 0
+        for b in self.bits:
+            # Zielzellen q, die mit einem Block dieses Typs eine Dreierreihe ergeben
+            left_h = (b >> 1) & (b >> 2)
+            right_h = (b << 1) & (b << 2)
+            mid_h = (b << 1) & (b >> 1)
+            left_v = (b >> s) & (b >> 2 * s)
+            right_v = (b << s) & (b << 2 * s)
+            mid_v = (b << s) & (b >> s)
+            any_h = left_h | right_h | mid_h
+            any_v = left_v | right_v | mid_v
+            # Herkunft des Blocks: rechts, links, unten, oben von q
+            from_right = (any_v | right_h) & (b >> 1)
+            from_left = (any_v | left_h) & (b << 1)
+            from_below = (any_h | right_v) & (b >> s)
+            from_above = (any_h | left_v) & (b << s)
+            horizontal |= from_right | ((from_left & valid) >> 1)
+            vertical |= from_below | (from_above >> s)
+        return horizontal & valid, vertical & valid
+
+    def legal_move_flags(self, moves):
+        """Flags for an (n, 4) array of y1, x1, y2, x2 moves with y1 <= y2 and x1 <= x2."""
+        horizontal, vertical = self.move_bits()
+        h = int_to_mask(horizontal, self.size)
+        v = int_to_mask(vertical, self.size)
+        y1, x1, y2, x2 = moves.T
+        return np.where(y1 == y2, h[y1, x1], v[y1, x1])
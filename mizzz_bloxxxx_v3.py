@@ -1,48 +1,47 @@
 import pygame
-import random
 import os
 import sys
 import numpy as np
-import colorsys
 import argparse
 import logging
 import textwrap
 import time
-import getpass
-
-parser = argparse.ArgumentParser(description='Mizzz Bloxxxxx Game')
-parser.add_argument('-nopixelshift', action='store_true', help='Disable smooth scaling')
-parser.add_argument('-showborder', action='store_true', help='Show grid borders')
-parser.add_argument('-about', action='store_true', help='Show about information')
-parser.add_argument('-log', action='store_true', help='Enable logging to file')
-args = parser.parse_args()
-
-use_smooth_scaling = not args.nopixelshift
-show_border = args.showborder
-
-if args.about:
-    print("mizzz bloxxxx by github.com/zeittresor")
-    sys.exit()
-
-if args.log:
-    logging.basicConfig(
-        filename='mizzz_bloxxxxx.log',
-        level=logging.DEBUG,
-        format='%(asctime)s %(levelname)s:%(message)s'
-    )
-    logging.debug('Logging enabled')
-else:
-    logging.basicConfig(level=logging.CRITICAL)
-
-pygame.init()
-pygame.mixer.init()
-
-SCREEN_WIDTH = pygame.display.Info().current_w
-SCREEN_HEIGHT = pygame.display.Info().current_h
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
-pygame.display.set_caption("Mizzz Bloxxxxx")
-
-clock = pygame.time.Clock()
+from mizzz_anim import Animator
+from mizzz_assets import AssetLoader
+from mizzz_audio import MusicPlayer, SoundEffects
+from mizzz_board import Board, EMPTY
+from mizzz_scores import HighscoreStore, open_score_database
+from mizzz_solver import HintWorker, Solver
+from mizzz_text import get_font, TextCache
+from mizzz_tint import tint, tint_key, key_values, TintCache
+
+# Beim Import passiert nichts außer Konstanten: pygame, Fenster, Sounds und
+# Bilder werden erst von init() bzw. run() gestartet/geladen.
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Mizzz Bloxxxxx Game')
+    parser.add_argument('-nopixelshift', action='store_true', help='Disable smooth scaling')
+    parser.add_argument('-showborder', action='store_true', help='Show grid borders')
+    parser.add_argument('-about', action='store_true', help='Show about information')
+    parser.add_argument('-log', action='store_true', help='Enable logging to file')
+    parser.add_argument('-bitboard', action='store_true', help='Use the bitboard rules engine')
+    parser.add_argument('-crosscheck', action='store_true', help='Check the bitboard engine against the grid (slow)')
+    parser.add_argument('-seed', type=int, help='Seed for the board generator (same seed, same boards)')
+    return parser.parse_args(argv)
+
+use_smooth_scaling = True
+show_border = False
+
+def setup_logging(enabled):
+    if enabled:
+        logging.basicConfig(
+            filename='mizzz_bloxxxxx.log',
+            level=logging.DEBUG,
+            format='%(asctime)s %(levelname)s:%(message)s'
+        )
+        logging.debug('Logging enabled')
+    else:
+        logging.basicConfig(level=logging.CRITICAL)
 
 GRID_SIZE = 10
 MARGIN = 10
@@ -56,31 +55,6 @@ BUTTON_WIDTH = 100
 BUTTON_HEIGHT = 40
 BUTTON_SPACING = 10
 
-font = pygame.font.SysFont(None, 48)
-counter_font = pygame.font.SysFont(None, 36)
-slider_font = pygame.font.SysFont(None, 24)
-button_font = pygame.font.SysFont(None, 30)
-
-slider_labels = ['Satuation', 'Brightness', 'Contrast', 'Colormap', 'BG Brightness', 'Transparence']
-label_widths = [slider_font.size(lbl)[0] for lbl in slider_labels]
-max_label_width = max(label_widths)
-SLIDER_OFFSET_X = MARGIN + max_label_width + 5
-
-BLOCK_SIZE = int(min(
-    (SCREEN_WIDTH - 2*MARGIN - SLIDER_OFFSET_X - SLIDER_WIDTH - SLIDER_SPACING) / GRID_SIZE,
-    (SCREEN_HEIGHT - TITLE_HEIGHT - COUNTER_HEIGHT - 2*MARGIN) / GRID_SIZE
-))
-
-BOARD_WIDTH = GRID_SIZE * BLOCK_SIZE
-BOARD_HEIGHT = GRID_SIZE * BLOCK_SIZE
-TOTAL_CONTENT_HEIGHT = TITLE_HEIGHT + BOARD_HEIGHT + COUNTER_HEIGHT + 2*MARGIN
-BOARD_OFFSET_X = (SCREEN_WIDTH - BOARD_WIDTH) // 2
-BOARD_OFFSET_Y = (SCREEN_HEIGHT - TOTAL_CONTENT_HEIGHT) // 2 + TITLE_HEIGHT + MARGIN
-SLIDER_OFFSET_Y = BOARD_OFFSET_Y
-
-BUTTON_OFFSET_X = SCREEN_WIDTH - MARGIN - BUTTON_WIDTH
-BUTTON_OFFSET_Y = MARGIN
-
 BACKGROUND_COLOR = (0, 0, 0)
 
 COLORS = [
@@ -95,195 +69,223 @@ COLORS = [
 ]
 
 DATA_DIR = 'data'
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
-    logging.debug(f"Created directory: {DATA_DIR}")
-
 TOP5_FILE = os.path.join(DATA_DIR, 'top5.txt')
+SCORES_DB = os.path.join(DATA_DIR, 'scores.sqlite3')
+CACHE_DIR = os.path.join(DATA_DIR, 'cache')
 
-def load_highscores():
-    if not os.path.isfile(TOP5_FILE):
-        return []
-    highscores = []
-    with open(TOP5_FILE, 'r', encoding='utf-8') as f:
-        for line in f:
-            line=line.strip()
-            if not line:
-                continue
-            # Format: blocks ; date ; time ; spent ; user
-            parts=line.split(';')
-            if len(parts)==5:
-                try:
-                    blocks=int(parts[0].strip())
-                    datum=parts[1].strip()
-                    zeit=parts[2].strip()
-                    spent=float(parts[3].strip())
-                    user=parts[4].strip()
-                    highscores.append((blocks, datum, zeit, spent, user))
-                except:
-                    pass
-    # Sortiere nach blocks aufsteigend
-    highscores.sort(key=lambda x: x[0])
-    # Begrenze auf 5
-    return highscores[:5]
-
-def save_highscores(highscores):
-    """Speichert die Highscore-Liste in top5.txt"""
-    with open(TOP5_FILE, 'w', encoding='utf-8') as f:
-        for entry in highscores:
-            blocks, datum, zeit, spent, user=entry
-            line=f"{blocks};{datum};{zeit};{spent:.2f};{user}\n"
-            f.write(line)
-
-def add_highscore(blocks_used, spent_time):
-    hs=load_highscores()
-    import datetime
-    now=datetime.datetime.now()
-    dat_str=now.strftime('%Y-%m-%d')
-    tim_str=now.strftime('%H:%M:%S')
-    user_name=getpass.getuser()  
-
-    new_entry=(blocks_used, dat_str, tim_str, spent_time, user_name)
-    hs.append(new_entry)
-    hs.sort(key=lambda x: x[0])
-    hs=hs[:5]  # nur 5
-    save_highscores(hs)
+slider_labels = ['Satuation', 'Brightness', 'Contrast', 'Colormap', 'BG Brightness', 'Transparence']
 
+# Gesetzt von init_display()/init_layout()
+screen = None
+clock = None
+SCREEN_WIDTH = SCREEN_HEIGHT = 0
+font = counter_font = slider_font = button_font = None
+text_cache = TextCache()
+
+def init_display(fullscreen=True):
+    """Startet pygame und öffnet das Spielfenster (Vollbild in Bildschirmgröße)."""
+    global screen, clock, SCREEN_WIDTH, SCREEN_HEIGHT
+    pygame.init()
+    pygame.mixer.init()
+
+    SCREEN_WIDTH = pygame.display.Info().current_w
+    SCREEN_HEIGHT = pygame.display.Info().current_h
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN if fullscreen else 0)
+    pygame.display.set_caption("Mizzz Bloxxxxx")
+
+    clock = pygame.time.Clock()
+
+def init_layout():
+    """Schriften und alle von der Bildschirmgröße abhängigen Maße."""
+    global font, counter_font, slider_font, button_font, label_widths, max_label_width
+    global SLIDER_OFFSET_X, SLIDER_OFFSET_Y, BLOCK_SIZE, BOARD_WIDTH, BOARD_HEIGHT, TOTAL_CONTENT_HEIGHT
+    global BOARD_OFFSET_X, BOARD_OFFSET_Y, BUTTON_OFFSET_X, BUTTON_OFFSET_Y
+    global cell_dests, BOARD_RECT, BUTTONS_RECT
+    font = get_font(None, 48)
+    counter_font = get_font(None, 36)
+    slider_font = get_font(None, 24)
+    button_font = get_font(None, 30)
+
+    label_widths = [slider_font.size(lbl)[0] for lbl in slider_labels]
+    max_label_width = max(label_widths)
+    SLIDER_OFFSET_X = MARGIN + max_label_width + 5
+
+    BLOCK_SIZE = int(min(
+        (SCREEN_WIDTH - 2*MARGIN - SLIDER_OFFSET_X - SLIDER_WIDTH - SLIDER_SPACING) / GRID_SIZE,
+        (SCREEN_HEIGHT - TITLE_HEIGHT - COUNTER_HEIGHT - 2*MARGIN) / GRID_SIZE
+    ))
+
+    BOARD_WIDTH = GRID_SIZE * BLOCK_SIZE
+    BOARD_HEIGHT = GRID_SIZE * BLOCK_SIZE
+    TOTAL_CONTENT_HEIGHT = TITLE_HEIGHT + BOARD_HEIGHT + COUNTER_HEIGHT + 2*MARGIN
+    BOARD_OFFSET_X = (SCREEN_WIDTH - BOARD_WIDTH) // 2
+    BOARD_OFFSET_Y = (SCREEN_HEIGHT - TOTAL_CONTENT_HEIGHT) // 2 + TITLE_HEIGHT + MARGIN
+    SLIDER_OFFSET_Y = BOARD_OFFSET_Y
+
+    BUTTON_OFFSET_X = SCREEN_WIDTH - MARGIN - BUTTON_WIDTH
+    BUTTON_OFFSET_Y = MARGIN
+
+    cell_dests = [(BOARD_OFFSET_X+x*BLOCK_SIZE, BOARD_OFFSET_Y+y*BLOCK_SIZE)
+                  for y in range(GRID_SIZE) for x in range(GRID_SIZE)]
+    BOARD_RECT = pygame.Rect(BOARD_OFFSET_X,BOARD_OFFSET_Y,BOARD_WIDTH,BOARD_HEIGHT)
+    BUTTONS_RECT = pygame.Rect(BUTTON_OFFSET_X,BUTTON_OFFSET_Y,BUTTON_WIDTH,5*BUTTON_HEIGHT+4*BUTTON_SPACING)
+
+def graphic_size(source_size):
+    """graphic.png höchstens so breit wie der Bildschirm (abzüglich Rand)."""
+    w,h=source_size
+    gw=min(w,SCREEN_WIDTH-2*MARGIN)
+    return (gw,int(h*gw/w))
+
+# Effekt -> (Datei, Kanal-Pool, Priorität); höhere Priorität verdrängt niedrigere
+SOUND_EFFECTS = {
+    'match': ('sound1.wav', 'match', 0),
+    'four_match': ('sound3.wav', 'match', 1),
+    'five_match': ('sound4.wav', 'match', 2),
+    'swap_fail': ('sound2.wav', 'ui', 0),
+    'help': ('hilfe.wav', 'ui', 1),
+    'hello': ('hello.wav', 'voice', 0),
+    'tschuess': ('tschuess.wav', 'voice', 1),
+}
+SOUND_POOLS = {'match': 4, 'ui': 2, 'voice': 2}
+
+MUSIC_END_EVENT = pygame.USEREVENT + 1
+HINT_EVENT = pygame.USEREVENT + 2
+# Ohne Animationen wartet die Hauptschleife auf Ereignisse, spätestens so lange
+IDLE_TIMEOUT_MS = 1000
+
+highscores = None
 block_images = []
-images_available = True
-for i in range(1, 9):
-    path_img = os.path.join(DATA_DIR, f'block{i}.png')
-    if os.path.isfile(path_img):
+use_colors_with_images = False
+sound_effects = None
+music_player = None
+background_image = None
+adjusted_background_image = None
+graphic_image = None
+graphic_rect = None
+shadow_offset = (3, 3)
+text_surface = None
+shadow_surface = None
+text_rect = None
+
+def load_assets():
+    """Lädt Highscores, Bilder, Sounds und Musikliste (braucht init_display/init_layout)."""
+    global highscores, block_images, use_colors_with_images
+    global sound_effects, music_player
+    global background_image, adjusted_background_image, graphic_image, graphic_rect
+    global text_surface, shadow_surface, text_rect
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
+        logging.debug(f"Created directory: {DATA_DIR}")
+
+    # Alle Spiele landen in SCORES_DB, top5.txt wird beim ersten Start übernommen
+    highscores=HighscoreStore(TOP5_FILE,database=open_score_database(SCORES_DB))
+
+    # Alle Bilder parallel dekodieren/skalieren, während Sounds und Musik laden
+    asset_loader = AssetLoader(CACHE_DIR, smooth=use_smooth_scaling)
+    block_image_paths = [os.path.join(DATA_DIR, f'block{i}.png') for i in range(1, 9)]
+    block_image_jobs = [asset_loader.submit(p, (BLOCK_SIZE, BLOCK_SIZE)) if os.path.isfile(p) else None
+                        for p in block_image_paths]
+    background_image_path = os.path.join(DATA_DIR, 'background.png')
+    background_image_job = None
+    if os.path.isfile(background_image_path):
+        background_image_job = asset_loader.submit(background_image_path, (SCREEN_WIDTH, SCREEN_HEIGHT), alpha=False)
+    graphic_image_path = os.path.join(DATA_DIR, 'graphic.png')
+    graphic_image_job = None
+    if os.path.isfile(graphic_image_path):
+        graphic_image_job = asset_loader.submit(graphic_image_path, graphic_size)
+
+    use_colors_with_images = os.path.isfile(os.path.join(DATA_DIR, 'farben.txt'))
+
+    sound_effects = SoundEffects(SOUND_POOLS)
+    for name, (filename, pool, priority) in SOUND_EFFECTS.items():
+        sound_effects.load(name, os.path.join(DATA_DIR, filename), pool, priority)
+
+    # Liest den ersten Titel schon, während die Bilder fertig werden
+    music_player = MusicPlayer(DATA_DIR, end_event=MUSIC_END_EVENT)
+    music_player.start()
+
+    if background_image_job is not None:
         try:
-            img = pygame.image.load(path_img).convert_alpha()
-            if use_smooth_scaling:
-                img = pygame.transform.smoothscale(img, (BLOCK_SIZE, BLOCK_SIZE))
-            else:
-                img = pygame.transform.scale(img, (BLOCK_SIZE, BLOCK_SIZE))
-            block_images.append(img)
-            logging.debug(f'Loaded image: {path_img}')
+            background_image = asset_loader.surface(background_image_job)
+            logging.debug(f'Loaded background image: {background_image_path}')
         except Exception as e:
-            logging.error(f'Error loading image {path_img}: {e}')
-            images_available = False
-            break
+            logging.error(f'Error loading background image {background_image_path}: {e}')
+            background_image = None
     else:
-        logging.warning(f'Image file not found: {path_img}')
-        images_available = False
-        break
-if not images_available or len(block_images) < 8:
+        logging.warning(f'Background image not found: {background_image_path}')
+        background_image = None
+
     block_images = []
+    images_available = True
+    for path_img, job in zip(block_image_paths, block_image_jobs):
+        if job is not None:
+            try:
+                img = asset_loader.surface(job)
+                block_images.append(img)
+                logging.debug(f'Loaded image: {path_img}')
+            except Exception as e:
+                logging.error(f'Error loading image {path_img}: {e}')
+                images_available = False
+                break
+        else:
+            logging.warning(f'Image file not found: {path_img}')
+            images_available = False
+            break
+    if not images_available or len(block_images) < 8:
+        block_images = []
 
-use_colors_with_images = os.path.isfile(os.path.join(DATA_DIR, 'farben.txt'))
+    adjusted_background_image = background_image.copy() if background_image else None
 
-def load_sound(sound_path):
-    if os.path.isfile(sound_path):
+    if graphic_image_job is not None:
         try:
-            snd = pygame.mixer.Sound(sound_path)
-            logging.debug(f'Loaded sound: {sound_path}')
-            return snd
+            graphic_image = asset_loader.surface(graphic_image_job)
+            graphic_rect = graphic_image.get_rect()
+            graphic_rect.centerx = SCREEN_WIDTH // 2
+            graphic_rect.bottom = BOARD_OFFSET_Y - 10
+            logging.debug(f'Loaded graphic: {graphic_image_path}')
         except Exception as e:
-            logging.error(f'Error loading sound {sound_path}: {e}')
-            return None
+            logging.error(f'Error loading graphic: {e}')
+            graphic_image = None
     else:
-        logging.warning(f'Sound file not found: {sound_path}')
-        return None
+        graphic_image = None
+        title_font = get_font(None, 72)
+        title_text = "Mizzz Bloxxxxx"
+        text_surface = title_font.render(title_text, True, (255, 255, 255))
+        shadow_surface = title_font.render(title_text, True, (0, 0, 0))
 
-match_sound = load_sound(os.path.join(DATA_DIR, 'sound1.wav'))
-swap_fail_sound = load_sound(os.path.join(DATA_DIR, 'sound2.wav'))
-four_match_sound = load_sound(os.path.join(DATA_DIR, 'sound3.wav'))
-five_match_sound = load_sound(os.path.join(DATA_DIR, 'sound4.wav'))
-hello_sound = load_sound(os.path.join(DATA_DIR, 'hello.wav'))
-tschuess_sound = load_sound(os.path.join(DATA_DIR, 'tschuess.wav'))
-help_sound = load_sound(os.path.join(DATA_DIR, 'hilfe.wav'))
-
-music_files = [f for f in os.listdir(DATA_DIR) if f.lower().endswith('.mp3')]
-music_files = [os.path.join(DATA_DIR, f) for f in music_files]
-if music_files:
-    logging.debug(f'Loaded music files: {music_files}')
-else:
-    logging.warning('No music files found')
-
-current_music_index = 0
-def play_next_music():
-    global current_music_index
-    if music_files:
-        try:
-            pygame.mixer.music.load(music_files[current_music_index])
-            pygame.mixer.music.play()
-            logging.debug(f'Playing music: {music_files[current_music_index]}')
-            current_music_index = (current_music_index + 1) % len(music_files)
-        except Exception as e:
-            logging.error(f'Error playing music {music_files[current_music_index]}: {e}')
+        text_rect = text_surface.get_rect()
+        text_rect.centerx = SCREEN_WIDTH // 2
+        text_rect.bottom = BOARD_OFFSET_Y - 10
+    asset_loader.shutdown(wait=False)
 
-def skip_music():
-    pygame.mixer.music.stop()
-    play_next_music()
+    create_grid_lines_surface()
 
-if music_files:
-    play_next_music()
+def skip_music():
+    music_player.skip()
 
 def check_music_end():
-    if not pygame.mixer.music.get_busy():
-        play_next_music()
-
-clock = pygame.time.Clock()
-
-background_image_path = os.path.join(DATA_DIR, 'background.png')
-if os.path.isfile(background_image_path):
-    try:
-        background_image = pygame.image.load(background_image_path).convert()
-        if use_smooth_scaling:
-            background_image = pygame.transform.smoothscale(background_image, (SCREEN_WIDTH, SCREEN_HEIGHT))
-        else:
-            background_image = pygame.transform.scale(background_image, (SCREEN_WIDTH, SCREEN_HEIGHT))
-        logging.debug(f'Loaded background image: {background_image_path}')
-    except Exception as e:
-        logging.error(f'Error loading background image {background_image_path}: {e}')
-        background_image = None
-else:
-    logging.warning(f'Background image not found: {background_image_path}')
-    background_image = None
-
-adjusted_background_image = background_image.copy() if background_image else None
-
-shadow_offset = (3, 3)
-text_surface = None
-shadow_surface = None
-text_rect = None
-
-graphic_image_path = os.path.join(DATA_DIR, 'graphic.png')
-if os.path.isfile(graphic_image_path):
-    try:
-        graphic_image = pygame.image.load(graphic_image_path).convert_alpha()
-        gw = min(graphic_image.get_width(), SCREEN_WIDTH - 2*MARGIN)
-        sf = gw / graphic_image.get_width()
-        gh = int(graphic_image.get_height()*sf)
-        if use_smooth_scaling:
-            graphic_image = pygame.transform.smoothscale(graphic_image, (gw, gh))
-        else:
-            graphic_image = pygame.transform.scale(graphic_image, (gw, gh))
-        graphic_rect = graphic_image.get_rect()
-        graphic_rect.centerx = SCREEN_WIDTH // 2
-        graphic_rect.bottom = BOARD_OFFSET_Y - 10
-        logging.debug(f'Loaded graphic: {graphic_image_path}')
-    except Exception as e:
-        logging.error(f'Error loading graphic: {e}')
-        graphic_image = None
-else:
-    graphic_image = None
-    title_font = pygame.font.SysFont(None, 72)
-    title_text = "Mizzz Bloxxxxx"
-    text_surface = title_font.render(title_text, True, (255, 255, 255))
-    shadow_surface = title_font.render(title_text, True, (0, 0, 0))
-
-    text_rect = text_surface.get_rect()
-    text_rect.centerx = SCREEN_WIDTH // 2
-    text_rect.bottom = BOARD_OFFSET_Y - 10
-
-grid = []
+    music_player.update()
+
+board = None
+animator = Animator()
+# Anzeigezustand der laufenden Animationen, siehe start_*_animation()
+anim_moved_cells = {}
+anim_matched = None
+anim_blink = True
+# Während ein Zug abgespielt wird, der angezeigte Stand (board ist schon fertig)
+display_grid = None
+move_in_progress = False
+tip_tween = None
+# Tips sucht ein Hintergrund-Thread, siehe init(); tip_requested merkt sich
+# einen Klick auf Tip, bis der Tip für das aktuelle Feld fertig ist
+solver = Solver()
+hint_worker = None
+tip_requested = False
 selected_block = None
 blocks_cleared = 0
 exit_prompt = False
+# Keine Züge mehr: no_more_moves() fragt in der Hauptschleife nach einem neuen Spiel
+game_over = False
 sliders_visible = False
 tip_highlight = None
 showing_help = False
@@ -297,15 +299,69 @@ bg_brightness = 0.5
 transparency_value = 0.5
 
 adjusted_images_cache = {}
+tint_palette = list(COLORS)
+tint_cache = TintCache()
+
+BLOCK_STATES = ('normal','selected','matched','tip')
+STATE_BORDER_COLORS = {'selected':(255,255,0),'matched':(0,255,0),'tip':(255,0,0)}
+block_sprites_key = None
+# Alle Block-Sprites in einer Surface: Spalte = Blocktyp, Zeile = Zustand,
+# die letzte Spalte bleibt leer (für leere/ausgeblendete Felder)
+block_atlas = None
+atlas_areas = []
+BLANK_SPRITE = len(COLORS)*len(BLOCK_STATES)
+cell_dests = []
+board_blits = []
+board_blit_codes = None
+moved_dests = {}
+
+# Bildschirm wird nur in geänderten Bereichen neu gezeichnet
+MAX_DIRTY_RECTS = 16
+BOARD_RECT = None
+BUTTONS_RECT = None
+static_layer = None
+full_redraw = True
+pending_rects = []
+counter_text = None
+counter_surfaces = None
+counter_rect = None
+panel_state = None
 
 start_time = None
 
+def init(argv=None, fullscreen=True):
+    """Startet das Spiel bis kurz vor die Hauptschleife: pygame, Fenster, Assets, Spielfeld.
+
+    argv wie auf der Kommandozeile (None = sys.argv); liefert die Argumente.
+    """
+    global use_smooth_scaling, show_border, board, hint_worker
+    args = parse_args(argv)
+    use_smooth_scaling = not args.nopixelshift
+    show_border = args.showborder
+    setup_logging(args.log)
+    init_display(fullscreen)
+    init_layout()
+    load_assets()
+    board = Board(GRID_SIZE, len(COLORS), seed=args.seed, backend='bitboard' if args.bitboard else 'array',
+                  cross_check=args.crosscheck)
+    hint_worker = HintWorker(solver, TIP_BUDGET_MS/1000,
+                             on_ready=lambda: pygame.event.post(pygame.event.Event(HINT_EVENT)))
+    hint_worker.start()
+    return args
+
+def run(argv=None):
+    """Einstiegspunkt: Argumente auswerten, alles initialisieren, spielen."""
+    if parse_args(argv).about:
+        print("mizzz bloxxxx by github.com/zeittresor")
+        return
+    init(argv)
+    main()
+
 def create_grid():
-    global grid, blocks_cleared
-    grid = [[random.randint(0,7) for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
+    global blocks_cleared, tip_requested
+    board.generate(5)
+    tip_requested=False
     blocks_cleared=0
-    while not has_possible_moves(5):
-        grid = [[random.randint(0,7) for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
 
 def create_grid_lines_surface():
     global grid_lines_surface
@@ -324,51 +380,126 @@ def create_grid_lines_surface():
     grid_lines_surface=surf
 
 grid_lines_surface = None
-create_grid_lines_surface()
 
-def adjust_color(color):
+def adjust_color(color,values):
     c=np.array(color,dtype=np.float32)/255.0
-    c+=(brightness-0.5)*2
-    c=np.clip(c,0,1)
-    hsv=list(colorsys.rgb_to_hsv(*c))
-    s_adj=(saturation-0.5)*2
-    h_adj=(hue-0.5)*2
-    hsv[1]+= s_adj
-    hsv[1]=np.clip(hsv[1],0,1)
-    hsv[0]+=h_adj
-    hsv[0]%=1.0
-    c=np.array(colorsys.hsv_to_rgb(*hsv))
-    c_adj=(contrast-0.5)*2
-    c=((c-0.5)*(c_adj+1))+0.5
-    c=np.clip(c,0,1)
-    return tuple((c*255).astype(int))
-
-def adjust_image(image):
+    c=tint(c,*values)
+    return tuple((c*255).astype(int).tolist())
+
+def adjust_image(image,values):
     arr=pygame.surfarray.array3d(image).astype(np.float32)/255.0
-    arr+=(brightness-0.5)*2
-    arr=np.clip(arr,0,1)
-    r,g,b=arr[...,0],arr[...,1],arr[...,2]
-    hsv=np.vectorize(colorsys.rgb_to_hsv)(r,g,b)
-    h,s,v=hsv
-    s+=(saturation-0.5)*2
-    s=np.clip(s,0,1)
-    h+=(hue-0.5)*2
-    h%=1.0
-    rgb=np.vectorize(colorsys.hsv_to_rgb)(h,s,v)
-    arr[...,0],arr[...,1],arr[...,2]=rgb
-    c_adj=(contrast-0.5)*2
-    arr=((arr-0.5)*(c_adj+1))+0.5
-    arr=np.clip(arr,0,1)
+    arr=tint(arr,*values)
     new_surf=pygame.Surface(image.get_size(),pygame.SRCALPHA)
     pygame.surfarray.blit_array(new_surf,(arr*255).astype(np.uint8))
     alpha_arr=pygame.surfarray.array_alpha(image)
     pygame.surfarray.pixels_alpha(new_surf)[:]=alpha_arr
     return new_surf
 
+def build_tint_set(key):
+    values=key_values(key)
+    sprites={idx: adjust_image(img,values) for idx, img in enumerate(block_images)}
+    palette=[adjust_color(c,values) for c in COLORS]
+    nbytes=sum(s.get_bytesize()*s.get_width()*s.get_height() for s in sprites.values())
+    return (sprites, palette), nbytes
+
 def adjust_and_cache_images():
-    adjusted_images_cache.clear()
-    for idx, img in enumerate(block_images):
-        adjusted_images_cache[idx] = adjust_image(img)
+    global adjusted_images_cache, tint_palette
+    key=tint_key(saturation,brightness,contrast,hue)
+    adjusted_images_cache, tint_palette=tint_cache.get(key,build_tint_set)
+    logging.debug(f'Tint cache: {tint_cache.stats()}')
+    build_block_sprites()
+
+def compose_block(bt,state):
+    """Ein fertiges Feld: Abdunklung, Farbe, Bild und ggf. Rahmen in einer Surface."""
+    surf=pygame.Surface((BLOCK_SIZE,BLOCK_SIZE),pygame.SRCALPHA)
+    img=None
+    if block_images:
+        img=adjusted_images_cache.get(bt) or block_images[bt]
+    if img and not use_colors_with_images:
+        # Bild "über" die halbtransparente Abdunklung legen; pygame würde beim
+        # Blit auf eine Alpha-Surface die Bildkanten zu dunkel mischen
+        dark_a=int(255*transparency_value)/255
+        img_a=pygame.surfarray.array_alpha(img).astype(np.float32)/255
+        out_a=img_a+dark_a*(1-img_a)
+        rgb=pygame.surfarray.array3d(img).astype(np.float32)*(img_a/np.maximum(out_a,1e-6))[...,None]
+        pygame.surfarray.blit_array(surf,rgb.astype(np.uint8))
+        pygame.surfarray.pixels_alpha(surf)[:]=(out_a*255).astype(np.uint8)
+    else:
+        # Die deckende Farbfläche verdeckt die Abdunklung ohnehin
+        surf.fill(tint_palette[bt])
+        if img:
+            surf.blit(img,(0,0))
+    if state in STATE_BORDER_COLORS:
+        pygame.draw.rect(surf,STATE_BORDER_COLORS[state],surf.get_rect(),3)
+    return surf.convert_alpha()
+
+def build_block_sprites():
+    """Baut den Block-Atlas neu, wenn sich Farbanpassung oder Transparenz geändert haben."""
+    global block_atlas, atlas_areas, block_sprites_key, board_blit_codes
+    key=(tint_key(saturation,brightness,contrast,hue),int(255*transparency_value))
+    if key==block_sprites_key:
+        return
+    n_states=len(BLOCK_STATES)
+    atlas=pygame.Surface(((len(COLORS)+1)*BLOCK_SIZE,n_states*BLOCK_SIZE),pygame.SRCALPHA)
+    atlas.fill((0,0,0,0))
+    atlas_areas=[]
+    for code in range(BLANK_SPRITE+1):
+        bt,st=divmod(code,n_states)
+        area=pygame.Rect(bt*BLOCK_SIZE,st*BLOCK_SIZE,BLOCK_SIZE,BLOCK_SIZE)
+        atlas_areas.append(area)
+        if code<BLANK_SPRITE:
+            # RGBA_MAX auf den leeren Atlas kopiert die Pixel unverändert
+            atlas.blit(compose_block(bt,BLOCK_STATES[st]),area,special_flags=pygame.BLEND_RGBA_MAX)
+    block_atlas=atlas.convert_alpha()
+    block_sprites_key=key
+    board_blit_codes=None
+
+def update_board_blits(selected_positions=None, matched_positions=None, blink=False,
+                       moved_cells=None):
+    """Aktualisiert die Blit-Liste aller Felder für den Atlas.
+
+    Die Liste bleibt zwischen den Frames erhalten, nur Felder mit anderem
+    Sprite werden ersetzt. moved_cells bildet (y,x) auf eine abweichende
+    Zielposition ab (Animationen). Gibt die Rechtecke zurück, die sich
+    dadurch auf dem Bildschirm ändern.
+    """
+    global board_blits, board_blit_codes, moved_dests
+    state=np.zeros((GRID_SIZE,GRID_SIZE),dtype=np.int16)
+    # In umgekehrter Priorität setzen: Auswahl vor Treffer vor Tip
+    for positions, st in ((tip_highlight,3),(matched_positions,2),(selected_positions,1)):
+        for y,x in positions or ():
+            state[y,x]=st
+    grid=board.grid if display_grid is None else display_grid
+    codes=grid.astype(np.int16)*len(BLOCK_STATES)+state
+    hidden=grid==EMPTY
+    if matched_positions and not blink:
+        hidden|=state==2
+    codes[hidden]=BLANK_SPRITE
+    codes=codes.ravel()
+    if board_blit_codes is None:
+        board_blits=[None]*len(codes)
+        changed=range(len(codes))
+    else:
+        changed=np.nonzero(codes!=board_blit_codes)[0].tolist()
+    dirty=[]
+    for i in changed:
+        board_blits[i]=(block_atlas,cell_dests[i],atlas_areas[codes[i]])
+        dirty.append(pygame.Rect(cell_dests[i],(BLOCK_SIZE,BLOCK_SIZE)))
+    board_blit_codes=codes
+    moved=moved_cells or {}
+    for (y,x), dest in moved_dests.items():
+        i=y*GRID_SIZE+x
+        dirty.append(pygame.Rect(dest,(BLOCK_SIZE,BLOCK_SIZE)).inflate(2,2))
+        if (y,x) not in moved:
+            board_blits[i]=(block_atlas,cell_dests[i],atlas_areas[codes[i]])
+            dirty.append(pygame.Rect(cell_dests[i],(BLOCK_SIZE,BLOCK_SIZE)))
+    for (y,x), dest in moved.items():
+        i=y*GRID_SIZE+x
+        board_blits[i]=(block_atlas,dest,atlas_areas[codes[i]])
+        dirty.append(pygame.Rect(dest,(BLOCK_SIZE,BLOCK_SIZE)).inflate(2,2))
+        dirty.append(pygame.Rect(cell_dests[i],(BLOCK_SIZE,BLOCK_SIZE)))
+    moved_dests=dict(moved)
+    return dirty
 
 def adjust_background_image():
     global adjusted_background_image
@@ -380,309 +511,215 @@ def adjust_background_image():
         pygame.surfarray.blit_array(adjusted_background_image,(arr*255).astype(np.uint8))
     else:
         adjusted_background_image=None
+    build_static_layer()
 
-def find_matches():
-    matched=[]
-    for y in range(GRID_SIZE):
-        x=0
-        while x<GRID_SIZE-2:
-            mt=[(y,x)]
-            bt=grid[y][x]
-            if bt!=-1:
-                for k in range(x+1,GRID_SIZE):
-                    if grid[y][k]==bt:
-                        mt.append((y,k))
-                    else:
-                        break
-                if len(mt)>=3:
-                    matched.extend(mt)
-                x+=len(mt)
-            else:
-                x+=1
-    for x in range(GRID_SIZE):
-        y=0
-        while y<GRID_SIZE-2:
-            mt=[(y,x)]
-            bt=grid[y][x]
-            if bt!=-1:
-                for k in range(y+1,GRID_SIZE):
-                    if grid[k][x]==bt:
-                        mt.append((k,x))
-                    else:
-                        break
-                if len(mt)>=3:
-                    matched.extend(mt)
-                y+=len(mt)
-            else:
-                y+=1
-    return list(set(matched))
+def build_static_layer():
+    """Hintergrund und Titel, die sich nur mit BG Brightness ändern."""
+    global static_layer
+    layer=pygame.Surface((SCREEN_WIDTH,SCREEN_HEIGHT)).convert()
+    if adjusted_background_image:
+        layer.blit(adjusted_background_image,(0,0))
+    else:
+        layer.fill(BACKGROUND_COLOR)
+    if graphic_image:
+        layer.blit(graphic_image,graphic_rect)
+    elif text_surface and shadow_surface and text_rect:
+        sh_pos=(text_rect.x+shadow_offset[0], text_rect.y+shadow_offset[1])
+        layer.blit(shadow_surface,sh_pos)
+        layer.blit(text_surface,text_rect)
+    static_layer=layer
+    mark_full_redraw()
 
-def swap_blocks(pos1,pos2):
-    y1,x1=pos1
-    y2,x2=pos2
-    grid[y1][x1],grid[y2][x2]=grid[y2][x2],grid[y1][x1]
+def mark_full_redraw():
+    global full_redraw
+    full_redraw=True
 
-def has_possible_moves(min_moves=1):
-    count=0
-    for y in range(GRID_SIZE):
-        for x in range(GRID_SIZE):
-            for dy,dx in [(-1,0),(1,0),(0,-1),(0,1)]:
-                ny,nx=y+dy,x+dx
-                if 0<=ny<GRID_SIZE and 0<=nx<GRID_SIZE:
-                    swap_blocks((y,x),(ny,nx))
-                    if find_matches():
-                        count+=1
-                        swap_blocks((y,x),(ny,nx))
-                        if count>=min_moves:
-                            return True
-                    else:
-                        swap_blocks((y,x),(ny,nx))
-    return False
-
-def find_possible_move():
-    for y in range(GRID_SIZE):
-        for x in range(GRID_SIZE):
-            for dy,dx in [(-1,0),(1,0),(0,-1),(0,1)]:
-                ny,nx=y+dy,x+dx
-                if 0<=ny<GRID_SIZE and 0<=nx<GRID_SIZE:
-                    swap_blocks((y,x),(ny,nx))
-                    if find_matches():
-                        swap_blocks((y,x),(ny,nx))
-                        return [(y,x),(ny,nx)]
-                    else:
-                        swap_blocks((y,x),(ny,nx))
-    return None
-
-def animate_swap(pos1,pos2):
-    y1,x1=pos1
-    y2,x2=pos2
-    xp1=BOARD_OFFSET_X+x1*BLOCK_SIZE
-    yp1=BOARD_OFFSET_Y+y1*BLOCK_SIZE
-    xp2=BOARD_OFFSET_X+x2*BLOCK_SIZE
-    yp2=BOARD_OFFSET_Y+y2*BLOCK_SIZE
-
-    steps=15
-    swapped_positions=[pos1,pos2]
-    swapped_positions_positions=[(xp1,yp1),(xp2,yp2)]
-    swapped_positions_destinations=[(xp2,yp2),(xp1,yp1)]
-
-    for i in range(steps+1):
-        pr=i/steps
-        draw_grid(
-            swapped_positions=swapped_positions,
-            swapped_positions_positions=swapped_positions_positions,
-            swapped_positions_destinations=swapped_positions_destinations,
-            swap_progress=pr
-        )
-        pygame.display.flip()
-        clock.tick(60)
-
-def animate_matches(matches):
-    duration=1000
-    st=pygame.time.get_ticks()
-    blink_interval=duration//2
-    last_blink_time=st
-    blink=True
+def slider_panel_rect():
+    total_slider_height=6*SLIDER_HEIGHT+5*SLIDER_SPACING
+    return pygame.Rect(SLIDER_OFFSET_X-max_label_width-5,SLIDER_OFFSET_Y,
+                       SLIDER_WIDTH+max_label_width+10,total_slider_height)
 
-    while pygame.time.get_ticks()-st<duration:
-        for event in pygame.event.get():
-            if event.type==pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-        now=pygame.time.get_ticks()
-        if now-last_blink_time>=blink_interval:
-            blink=not blink
-            last_blink_time=now
-        draw_grid(matched_positions=matches,blink=blink)
-        pygame.display.flip()
-        clock.tick(60)
-
-def animate_falling(columns):
-    falling=True
-    velocities={}
-    positions={}
-    gravity=0.7
-    while falling:
-        falling=False
-
-        if adjusted_background_image:
-            screen.blit(adjusted_background_image,(0,0))
-        else:
-            screen.fill(BACKGROUND_COLOR)
-
-        if graphic_image:
-            screen.blit(graphic_image,graphic_rect)
-        elif text_surface and shadow_surface and text_rect:
-            sp=(text_rect.x+shadow_offset[0], text_rect.y+shadow_offset[1])
-            screen.blit(shadow_surface,sp)
-            screen.blit(text_surface,text_rect)
-
-        c_text=f"Killed Xenobug Blocks: {blocks_cleared}"
-        c_s=counter_font.render(c_text,True,(255,255,255))
-        sc_s=counter_font.render(c_text,True,(0,0,0))
-        c_rect=c_s.get_rect()
-        c_rect.centerx=SCREEN_WIDTH//2
-        c_rect.top=BOARD_OFFSET_Y+BOARD_HEIGHT+10
-        sofs=(2,2)
-        sc_rect=c_rect.copy()
-        sc_rect.x+=sofs[0]
-        sc_rect.y+=sofs[1]
-        screen.blit(sc_s,sc_rect)
-        screen.blit(c_s,c_rect)
-
-        for y in range(GRID_SIZE):
-            for x in range(GRID_SIZE):
-                bt=grid[y][x]
-                if bt==-1:
-                    continue
-                key=(y,x)
-                tx=BOARD_OFFSET_X+x*BLOCK_SIZE
-                ty=BOARD_OFFSET_Y+y*BLOCK_SIZE
-
-                if x in columns:
-                    if key not in positions:
-                        positions[key]=ty-BLOCK_SIZE
-                        velocities[key]=0
-                        falling=True
-                    if positions[key]<ty:
-                        velocities[key]+=gravity
-                        positions[key]+= velocities[key]
-                        if positions[key]>=ty:
-                            positions[key]=ty
-                        else:
-                            falling=True
-                        rect=pygame.Rect(tx,positions[key],BLOCK_SIZE,BLOCK_SIZE)
-                    else:
-                        rect=pygame.Rect(tx,ty,BLOCK_SIZE,BLOCK_SIZE)
-                else:
-                    rect=pygame.Rect(tx,ty,BLOCK_SIZE,BLOCK_SIZE)
-
-                alpha=int(255*transparency_value)
-                dark=pygame.Surface((BLOCK_SIZE,BLOCK_SIZE),pygame.SRCALPHA)
-                dark.fill((0,0,0,alpha))
-                screen.blit(dark,rect)
-
-                if block_images:
-                    if use_colors_with_images:
-                        ac=adjust_color(COLORS[bt])
-                        c_sf=pygame.Surface((BLOCK_SIZE,BLOCK_SIZE),pygame.SRCALPHA)
-                        c_sf.fill(ac)
-                        screen.blit(c_sf,rect)
-                    adj=adjusted_images_cache.get(bt)
-                    if adj:
-                        screen.blit(adj,rect)
-                    else:
-                        screen.blit(block_images[bt],rect)
-                else:
-                    c=COLORS[bt]
-                    ac=adjust_color(c)
-                    c_sf=pygame.Surface((BLOCK_SIZE,BLOCK_SIZE),pygame.SRCALPHA)
-                    c_sf.fill(ac)
-                    screen.blit(c_sf,rect)
+def side_panel_rect(button_rows):
+    """Panel rechts unter den Buttons (Help: 6 Zeilen, Top5: 5 Zeilen Abstand)."""
+    panel_width=300
+    panel_start_y=BUTTON_OFFSET_Y+button_rows*(BUTTON_HEIGHT+BUTTON_SPACING)+10
+    panel_height=SCREEN_HEIGHT - panel_start_y - MARGIN
+    panel_x=SCREEN_WIDTH - panel_width - MARGIN
+    return pygame.Rect(panel_x,panel_start_y,panel_width,panel_height)
 
+def update_counter():
+    """Rendert den Zähler nur neu, wenn sich der Text ändert; liefert geänderte Bereiche."""
+    global counter_text, counter_surfaces, counter_rect
+    c_txt=f"Killed Xenobug Blocks: {blocks_cleared}"
+    if c_txt==counter_text:
+        return []
+    dirty=[counter_rect] if counter_rect else []
+    sc_s,c_s=text_cache.render_shadowed(counter_font,c_txt)
+    c_rect=c_s.get_rect()
+    c_rect.centerx=SCREEN_WIDTH//2
+    c_rect.top=BOARD_OFFSET_Y+BOARD_HEIGHT+10
+    sofs=(2,2)
+    sc_rect=c_rect.move(sofs)
+    counter_text=c_txt
+    counter_surfaces=((sc_s,sc_rect),(c_s,c_rect))
+    counter_rect=c_rect.union(sc_rect)
+    dirty.append(counter_rect)
+    return dirty
+
+def draw_region(rect):
+    """Zeichnet alle Ebenen neu, beschränkt auf rect."""
+    screen.set_clip(rect)
+    screen.blit(static_layer,rect,rect)
+    if counter_rect and rect.colliderect(counter_rect):
+        screen.blits(counter_surfaces,doreturn=False)
+    if rect.colliderect(BOARD_RECT):
+        # Blöcke nur im Spielfeld, neue rutschen oben herein
+        screen.set_clip(rect.clip(BOARD_RECT))
+        screen.blits(board_blits,doreturn=False)
+        screen.set_clip(rect)
         screen.blit(grid_lines_surface,(BOARD_OFFSET_X,BOARD_OFFSET_Y))
+    if rect.colliderect(BUTTONS_RECT):
         draw_buttons()
-        if sliders_visible:
-            draw_sliders()
-        if showing_help:
-            draw_help_panel()
-        if showing_top5:
-            draw_top5_panel()
-
-        pygame.display.flip()
-        clock.tick(60)
-
-def collapse_grid():
-    columns=set()
-    for x in range(GRID_SIZE):
-        column=[]
-        for y in range(GRID_SIZE-1,-1,-1):
-            if grid[y][x]!=-1:
-                column.append(grid[y][x])
-        missing=GRID_SIZE-len(column)
-        new_blocks=[random.randint(0,7) for _ in range(missing)]
-        column+=new_blocks
-        column.reverse()
-        for y in range(GRID_SIZE):
-            grid[y][x]=column[y]
-        if missing>0:
-            columns.add(x)
-    if columns:
-        animate_falling(columns)
-
-def no_more_moves():
-    txt=font.render("Problem solved ! Another try ? (j/n)",True,(255,255,255))
-    sh_txt=font.render("Problem solved ! Another try ? (j/n)",True,(0,0,0))
-    retry_txt=font.render("",True,(255,255,255))  
-    sh_retry=font.render("",True,(0,0,0))         
-
-    t_rect=txt.get_rect()
-    t_rect.centerx=SCREEN_WIDTH//2
-    t_rect.centery=SCREEN_HEIGHT//2-50
-
-    r_rect=retry_txt.get_rect()
-    r_rect.centerx=SCREEN_WIDTH//2
-    r_rect.centery=SCREEN_HEIGHT//2
-
-    sofs=(2,2)
-    s_txt_rect=t_rect.copy()
-    s_txt_rect.x+=sofs[0]
-    s_txt_rect.y+=sofs[1]
-    s_r_rect=r_rect.copy()
-    s_r_rect.x+=sofs[0]
-    s_r_rect.y+=sofs[1]
-
-    screen.blit(sh_txt,s_txt_rect)
-    screen.blit(txt,t_rect)
-    screen.blit(sh_retry,s_r_rect)
-    screen.blit(retry_txt,r_rect)
-    pygame.display.flip()
-
-    end_time=time.time()
-    spent_time=end_time - start_time
-    add_highscore(blocks_cleared,spent_time)
-
-    waiting=True
-    while waiting:
-        for event in pygame.event.get():
-            if event.type==pygame.KEYDOWN:
-                if event.key==pygame.K_j:
-                    create_grid()
-                    waiting=False
-                elif event.key==pygame.K_n:
-                    fade_out_and_quit()
-            elif event.type==pygame.QUIT:
-                fade_out_and_quit()
-
-def show_exit_prompt():
-    ex_txt=font.render("EXit Game j/n",True,(255,255,255))
-    sh_ex_txt=font.render("Exit Game j/n",True,(0,0,0))
-
-    t_rect=ex_txt.get_rect()
-    t_rect.centerx=SCREEN_WIDTH//2
-    t_rect.centery=SCREEN_HEIGHT//2
-    sofs=(2,2)
-    sh_rect=t_rect.copy()
-    sh_rect.x+=sofs[0]
-    sh_rect.y+=sofs[1]
-
-    screen.blit(sh_ex_txt,sh_rect)
-    screen.blit(ex_txt,t_rect)
-    pygame.display.flip()
-
-def fade_out_and_quit():
-    if tschuess_sound:
-        tschuess_sound.play()
-    pygame.mixer.music.fadeout(5000)
-    fd_s=pygame.Surface((SCREEN_WIDTH,SCREEN_HEIGHT))
-    fd_s=fd_s.convert_alpha()
-    for alpha in range(0,255,5):
-        fd_s.fill((0,0,0,alpha))
-        screen.blit(fd_s,(0,0))
-        pygame.display.flip()
-        pygame.time.delay(100)
-    pygame.quit()
-    sys.exit()
+    if sliders_visible and rect.colliderect(slider_panel_rect()):
+        draw_sliders()
+    if showing_help and rect.colliderect(help_panel_area()):
+        draw_help_panel()
+    if showing_top5 and rect.colliderect(side_panel_area(5)):
+        draw_top5_panel()
+    screen.set_clip(None)
+
+def present():
+    """Bringt die seit dem letzten Aufruf neu gezeichneten Bereiche auf den Bildschirm."""
+    global pending_rects
+    if pending_rects:
+        pygame.display.update(pending_rects)
+        pending_rects=[]
+
+ANIM_SWAP_MS = 250
+ANIM_MATCH_MS = 1000
+ANIM_TIP_MS = 1000
+TIP_BUDGET_MS = 100  # so lange darf die Suche nach dem besten Zug dauern
+FALL_GRAVITY = 0.7  # Pixel pro Frame² bei 60 fps
+
+def start_swap_animation(pos1,pos2,on_done):
+    """Lässt die Blöcke an pos1 und pos2 die Plätze tauschen (nur Anzeige)."""
+    d1=cell_dests[pos1[0]*GRID_SIZE+pos1[1]]
+    d2=cell_dests[pos2[0]*GRID_SIZE+pos2[1]]
+
+    def update(t):
+        anim_moved_cells[pos1]=(d1[0]+(d2[0]-d1[0])*t,d1[1]+(d2[1]-d1[1])*t)
+        anim_moved_cells[pos2]=(d2[0]+(d1[0]-d2[0])*t,d2[1]+(d1[1]-d2[1])*t)
+
+    def done():
+        anim_moved_cells.pop(pos1,None)
+        anim_moved_cells.pop(pos2,None)
+        on_done()
+    animator.tween(ANIM_SWAP_MS,update,done)
+
+def start_match_animation(matches,on_done):
+    """Treffer hervorheben, nach der halben Zeit ausblenden."""
+    global anim_matched, anim_blink
+    anim_matched=matches
+    anim_blink=True
+
+    def update(t):
+        global anim_blink
+        anim_blink=t<0.5
+
+    def done():
+        global anim_matched
+        anim_matched=None
+        on_done()
+    animator.tween(ANIM_MATCH_MS,update,done)
+
+def start_falling_animation(step,on_done):
+    """Die Blöcke eines Kaskadenschritts fallen beschleunigt wie früher pro Frame.
+
+    Jeder nachgerutschte Block fällt seine Strecke, die neuen einer Spalte
+    kommen von oberhalb des Spielfelds.
+    """
+    spawned_per_column={}
+    for (y,x),_ in step.spawned:
+        spawned_per_column[x]=spawned_per_column.get(x,0)+1
+    falls=[(dst,dst[0]-src[0]) for src,dst in step.moves]
+    falls+=[(cell,spawned_per_column[cell[1]]) for cell,_ in step.spawned]
+    if not falls:
+        on_done()
+        return
+    distance=max(rows for _,rows in falls)*BLOCK_SIZE
+    frames=1
+    while FALL_GRAVITY*frames*(frames+1)/2<distance:
+        frames+=1
+
+    def update(t):
+        n=t*frames
+        drop=FALL_GRAVITY*n*(n+1)/2
+        for (y,x),rows in falls:
+            dx,dy=cell_dests[y*GRID_SIZE+x]
+            anim_moved_cells[(y,x)]=(dx,dy-rows*BLOCK_SIZE+min(rows*BLOCK_SIZE,drop))
+
+    def done():
+        for cell,_ in falls:
+            anim_moved_cells.pop(cell,None)
+        on_done()
+    animator.tween(frames*1000/60,update,done)
+
+def start_move(pos1,pos2):
+    """Zug: board.apply_move() rechnet die ganze Kaskade sofort aus, die
+    Animationen spielen sie danach auf display_grid ab."""
+    global move_in_progress, display_grid, tip_requested
+    move_in_progress=True
+    tip_requested=False
+    display_grid=board.grid.copy()
+    steps=board.apply_move(pos1,pos2)
+
+    def swap_display():
+        display_grid[pos1],display_grid[pos2]=display_grid[pos2],display_grid[pos1]
+
+    def swapped():
+        swap_display()
+        if steps:
+            play_cascade(steps)
+        else:
+            start_swap_animation(pos1,pos2,swapped_back)
+
+    def swapped_back():
+        swap_display()
+        sound_effects.play('swap_fail')
+        finish_move()
+    start_swap_animation(pos1,pos2,swapped)
+
+def play_cascade(steps):
+    """Ein Kaskadenschritt: Treffer blinken, löschen, nachfallen lassen, dann der nächste."""
+    global blocks_cleared
+    if not steps:
+        finish_move()
+        return
+    step=steps[0]
+    match_length=len(step.cleared)
+    if match_length>=5 and sound_effects.has('five_match'):
+        sound_effects.play('five_match')
+    elif match_length==4 and sound_effects.has('four_match'):
+        sound_effects.play('four_match')
+    else:
+        sound_effects.play('match')
+    blocks_cleared+=match_length
+
+    def cleared():
+        for cell in step.cleared:
+            display_grid[cell]=EMPTY
+        fallen=[display_grid[src] for src,_ in step.moves]
+        for (_,dst),block in zip(step.moves,fallen):
+            display_grid[dst]=block
+        for cell,block in step.spawned:
+            display_grid[cell]=block
+        start_falling_animation(step,lambda:play_cascade(steps[1:]))
+    start_match_animation(step.cleared,cleared)
+
+def finish_move():
+    global move_in_progress, display_grid
+    move_in_progress=False
+    display_grid=None
 
 grafik_button_rect_global=None
 tip_button_rect_global=None
@@ -698,7 +735,7 @@ def draw_buttons():
     gf_rect=pygame.Rect(BUTTON_OFFSET_X,BUTTON_OFFSET_Y,BUTTON_WIDTH,BUTTON_HEIGHT)
     pygame.draw.rect(screen,(50,50,50),gf_rect)
     pygame.draw.rect(screen,(255,255,255),gf_rect,2)
-    gf_txt=button_font.render("Graphic",True,(255,255,255))
+    gf_txt=text_cache.render(button_font,"Graphic",(255,255,255))
     gf_txt_r=gf_txt.get_rect(center=gf_rect.center)
     screen.blit(gf_txt,gf_txt_r)
 
@@ -706,7 +743,7 @@ def draw_buttons():
                          BUTTON_WIDTH,BUTTON_HEIGHT)
     pygame.draw.rect(screen,(50,50,50),tip_rect)
     pygame.draw.rect(screen,(255,255,255),tip_rect,2)
-    tip_txt=button_font.render("Tip",True,(255,255,255))
+    tip_txt=text_cache.render(button_font,"Tip",(255,255,255))
     tip_txt_r=tip_txt.get_rect(center=tip_rect.center)
     screen.blit(tip_txt,tip_txt_r)
 
@@ -714,7 +751,7 @@ def draw_buttons():
                         BUTTON_WIDTH,BUTTON_HEIGHT)
     pygame.draw.rect(screen,(50,50,50),hf_rect)
     pygame.draw.rect(screen,(255,255,255),hf_rect,2)
-    hf_txt=button_font.render("Help",True,(255,255,255))
+    hf_txt=text_cache.render(button_font,"Help",(255,255,255))
     hf_txt_r=hf_txt.get_rect(center=hf_rect.center)
     screen.blit(hf_txt,hf_txt_r)
 
@@ -722,7 +759,7 @@ def draw_buttons():
                         BUTTON_WIDTH,BUTTON_HEIGHT)
     pygame.draw.rect(screen,(50,50,50),ms_rect)
     pygame.draw.rect(screen,(255,255,255),ms_rect,2)
-    ms_txt=button_font.render("Music",True,(255,255,255))
+    ms_txt=text_cache.render(button_font,"Music",(255,255,255))
     ms_txt_r=ms_txt.get_rect(center=ms_rect.center)
     screen.blit(ms_txt,ms_txt_r)
 
@@ -731,7 +768,7 @@ def draw_buttons():
                          BUTTON_WIDTH,BUTTON_HEIGHT)
     pygame.draw.rect(screen,(50,50,50),top_rect)
     pygame.draw.rect(screen,(255,255,255),top_rect,2)
-    top_txt=button_font.render("Scores",True,(255,255,255))
+    top_txt=text_cache.render(button_font,"Scores",(255,255,255))
     top_txt_r=top_txt.get_rect(center=top_rect.center)
     screen.blit(top_txt,top_txt_r)
 
@@ -741,27 +778,63 @@ def draw_buttons():
     musik_button_rect_global=ms_rect
     top5_button_rect_global=top_rect
 
-def draw_help_panel():
-    help_file_path=os.path.join(DATA_DIR,'hilfe.txt')
-    if os.path.isfile(help_file_path):
+HELP_FILE = os.path.join(DATA_DIR,'hilfe.txt')
+HELP_CHECK_INTERVAL = 3.0
+help_panel_surface = None
+help_file_stamp = None
+help_last_check = 0.0
+
+def help_file_signature():
+    try:
+        st=os.stat(HELP_FILE)
+    except OSError:
+        return None
+    return (st.st_mtime_ns,st.st_size)
+
+def read_help_text():
+    if os.path.isfile(HELP_FILE):
         try:
-            with open(help_file_path,'r',encoding='utf-8') as f:
-                help_text=f.read()
+            with open(HELP_FILE,'r',encoding='utf-8') as f:
+                return f.read()
         except Exception as e:
             logging.error(f'Error reading hilfe.txt: {e}')
-            help_text="github.com/zeittresor"
-    else:
-        help_text="github.com/zeittresor"
-
-    panel_width=300
-    panel_start_y=BUTTON_OFFSET_Y + 6*(BUTTON_HEIGHT+BUTTON_SPACING) + 10
-    panel_height=SCREEN_HEIGHT - panel_start_y - MARGIN
-    panel_x=SCREEN_WIDTH - panel_width - MARGIN
-    panel_rect=pygame.Rect(panel_x,panel_start_y,panel_width,panel_height)
-
-    panel_surf=pygame.Surface(panel_rect.size,pygame.SRCALPHA)
-    panel_surf.fill((100,100,100,128))
-    screen.blit(panel_surf,(panel_rect.x,panel_rect.y))
+    return "github.com/zeittresor"
+
+def side_panel_area(button_rows):
+    """Seitenpanel plus rechter Rand, in den lange Zeilen hineinragen dürfen."""
+    rect=side_panel_rect(button_rows)
+    rect.width+=MARGIN
+    return rect
+
+def help_panel_area():
+    return side_panel_area(6)
+
+def new_panel_surface(button_rows):
+    """Leere premultiplied-alpha Surface mit dem halbtransparenten Panel-Hintergrund."""
+    panel_rect=side_panel_rect(button_rows)
+    panel_surf=pygame.Surface(side_panel_area(button_rows).size,pygame.SRCALPHA)
+    panel_surf.fill((0,0,0,0))
+    panel_surf.fill((100*128//255,100*128//255,100*128//255,128),((0,0),panel_rect.size))
+    return panel_surf
+
+def blit_panel_text(panel_surf,panel_font,line,pos):
+    """Schreibt eine Zeile mit Schatten auf eine Panel-Surface; liefert die Zeilenhöhe."""
+    if not line:
+        # premul_alpha() verträgt keine Surfaces mit Breite 0
+        return panel_font.get_height()
+    ts=panel_font.render(line,True,(255,255,255)).convert_alpha().premul_alpha()
+    shadow=panel_font.render(line,True,(0,0,0)).convert_alpha().premul_alpha()
+    panel_surf.blit(shadow,(pos[0]+2,pos[1]+2),special_flags=pygame.BLEND_PREMULTIPLIED)
+    panel_surf.blit(ts,pos,special_flags=pygame.BLEND_PREMULTIPLIED)
+    return ts.get_height()
+
+def render_help_panel(help_text):
+    """Rendert das komplette Hilfe-Panel vorab in eine Surface.
+
+    Die Surface ist premultiplied-alpha, damit Text auf dem halbtransparenten
+    Panel genauso aussieht, als würde er direkt auf den Bildschirm gezeichnet.
+    """
+    panel_surf=new_panel_surface(6)
 
     lines=[]
     wrapper=textwrap.TextWrapper(width=40)
@@ -773,70 +846,56 @@ def draw_help_panel():
             for wrapped_line in wrapper.wrap(raw_line):
                 lines.append(wrapped_line)
 
-    help_font=pygame.font.SysFont(None,24)
+    help_font=get_font(None,24)
     x_ofs=10
-    y_ofs=10
-    curr_y=panel_start_y+y_ofs
+    curr_y=10
 
     for line in lines:
         if line=='':
             curr_y+=help_font.get_height()
             continue
-        ts=help_font.render(line,True,(255,255,255))
-        shadow=help_font.render(line,True,(0,0,0))
-        text_rect=ts.get_rect()
-        text_rect.x=panel_x+x_ofs
-        text_rect.y=curr_y
-        sh_rect=text_rect.copy()
-        sh_rect.x+=2
-        sh_rect.y+=2
-        screen.blit(shadow,sh_rect)
-        screen.blit(ts,text_rect)
-        curr_y+=ts.get_height()+3
+        curr_y+=blit_panel_text(panel_surf,help_font,line,(x_ofs,curr_y))+3
+    return panel_surf
+
+def update_help_panel():
+    """Lädt hilfe.txt nur neu, wenn sich mtime/Größe geändert haben.
+
+    Die Datei wird höchstens alle HELP_CHECK_INTERVAL Sekunden geprüft.
+    Gibt True zurück, wenn das Panel neu gerendert wurde.
+    """
+    global help_panel_surface, help_file_stamp, help_last_check
+    now=time.monotonic()
+    if help_panel_surface is not None and now-help_last_check<HELP_CHECK_INTERVAL:
+        return False
+    help_last_check=now
+    stamp=help_file_signature()
+    if help_panel_surface is not None and stamp==help_file_stamp:
+        return False
+    help_panel_surface=render_help_panel(read_help_text())
+    help_file_stamp=stamp
+    logging.debug(f'Rendered help panel ({HELP_FILE}: {stamp})')
+    return True
 
-def draw_top5_panel():
-    highscores=load_highscores()
-    panel_width=300
-    panel_start_y=BUTTON_OFFSET_Y+5*(BUTTON_HEIGHT+BUTTON_SPACING)+10
-    panel_height=SCREEN_HEIGHT - panel_start_y - MARGIN
-    panel_x=SCREEN_WIDTH - panel_width - MARGIN
-    panel_rect=pygame.Rect(panel_x,panel_start_y,panel_width,panel_height)
+def draw_help_panel():
+    update_help_panel()
+    screen.blit(help_panel_surface,help_panel_area(),special_flags=pygame.BLEND_PREMULTIPLIED)
 
-    panel_surf=pygame.Surface(panel_rect.size,pygame.SRCALPHA)
-    panel_surf.fill((100,100,100,128))
-    screen.blit(panel_surf,(panel_rect.x,panel_rect.y))
+top5_panel_surface = None
+top5_panel_version = None
 
-    help_font=pygame.font.SysFont(None,24)
+def render_top5_panel(entries):
+    """Rendert das Top-5-Panel vorab, wie render_help_panel()."""
+    panel_surf=new_panel_surface(5)
+    help_font=get_font(None,24)
     x_ofs=10
-    y_ofs=10
-    curr_y=panel_start_y+y_ofs
-
-    title_s=help_font.render("Top 5 Games",True,(255,255,255))
-    shadow=help_font.render("Top 5 Games",True,(0,0,0))
-    t_rect=title_s.get_rect()
-    t_rect.x=panel_x+x_ofs
-    t_rect.y=curr_y
-    sh_rect=t_rect.copy()
-    sh_rect.x+=2
-    sh_rect.y+=2
-    screen.blit(shadow,sh_rect)
-    screen.blit(title_s,t_rect)
-    curr_y+=t_rect.height+10
-
-    if not highscores:
-        no_s=help_font.render("No entries yet.",True,(255,255,255))
-        no_shadow=help_font.render("No entries yet.",True,(0,0,0))
-        nr=no_s.get_rect()
-        nr.x=panel_x+x_ofs
-        nr.y=curr_y
-        sr=nr.copy()
-        sr.x+=2
-        sr.y+=2
-        screen.blit(no_shadow,sr)
-        screen.blit(no_s,nr)
-        return
+    curr_y=10
+
+    curr_y+=blit_panel_text(panel_surf,help_font,"Top 5 Games",(x_ofs,curr_y))+10
+    if not entries:
+        blit_panel_text(panel_surf,help_font,"No entries yet.",(x_ofs,curr_y))
+        return panel_surf
     place=1
-    for entry in highscores:
+    for entry in entries:
         blocks, datum, zeit, spent, user=entry
         line_platz=f"Platz {place}"
         line_blocks=f"Benötigte Blöcke: {blocks}"
@@ -846,18 +905,22 @@ def draw_top5_panel():
 
         lines=[line_platz, line_blocks, line_date, line_spent, line_user, ""]
         for l in lines:
-            ts=help_font.render(l,True,(255,255,255))
-            sh=help_font.render(l,True,(0,0,0))
-            tr=ts.get_rect()
-            tr.x=panel_x+x_ofs
-            tr.y=curr_y
-            shr=tr.copy()
-            shr.x+=2
-            shr.y+=2
-            screen.blit(sh,shr)
-            screen.blit(ts,tr)
-            curr_y+=ts.get_height()+3
+            curr_y+=blit_panel_text(panel_surf,help_font,l,(x_ofs,curr_y))+3
         place+=1
+    return panel_surf
+
+def update_top5_panel():
+    """Rendert das Panel nur neu, wenn sich die Highscores geändert haben (True dann)."""
+    global top5_panel_surface, top5_panel_version
+    if top5_panel_surface is not None and top5_panel_version==highscores.version:
+        return False
+    top5_panel_surface=render_top5_panel(highscores.entries)
+    top5_panel_version=highscores.version
+    return True
+
+def draw_top5_panel():
+    update_top5_panel()
+    screen.blit(top5_panel_surface,side_panel_area(5),special_flags=pygame.BLEND_PREMULTIPLIED)
 
 def draw_sliders():
     s_x=SLIDER_OFFSET_X
@@ -882,7 +945,7 @@ def draw_sliders():
     ]
 
     for lbl,val in sliders:
-        lbl_s=slider_font.render(lbl,True,(255,255,255))
+        lbl_s=text_cache.render(slider_font,lbl,(255,255,255))
         lbl_r=lbl_s.get_rect()
         lbl_r.right=s_x-5
         lbl_r.centery=s_y+SLIDER_HEIGHT//2
@@ -931,13 +994,29 @@ def handle_slider_click(pos):
                 adjust_background_image()
             elif name=='transparency':
                 transparency_value=val
+                build_block_sprites()
 
-            if block_images and name not in ('bg_brightness','transparency'):
+            if name not in ('bg_brightness','transparency'):
                 adjust_and_cache_images()
             break
 
+def show_hint():
+    """Zeigt einen angeforderten Tip, sobald er für das aktuelle Feld berechnet ist."""
+    global tip_requested, tip_highlight, tip_tween
+    hint=hint_worker.result(board) if tip_requested else None
+    if hint is None:
+        return
+    tip_requested=False
+    tip_highlight=hint.move
+    tip_tween=animator.delay(ANIM_TIP_MS,clear_tip)
+
+def clear_tip():
+    global tip_highlight, tip_tween
+    tip_highlight=None
+    tip_tween=None
+
 def handle_button_click(pos):
-    global sliders_visible, tip_highlight, showing_help, showing_top5
+    global sliders_visible, tip_highlight, tip_tween, tip_requested, showing_help, showing_top5
     x, y = pos
 
     if grafik_button_rect_global and grafik_button_rect_global.collidepoint(x,y):
@@ -945,26 +1024,25 @@ def handle_button_click(pos):
         return
 
     if tip_button_rect_global and tip_button_rect_global.collidepoint(x,y):
-        tip_highlight=find_possible_move()
-        if tip_highlight:
-            highlight_duration=1000
-            st=pygame.time.get_ticks()
-            while pygame.time.get_ticks()-st<highlight_duration:
-                draw_grid()
-                pygame.display.flip()
-                clock.tick(60)
-            tip_highlight=None
+        # Der Tip gilt für das Feld nach dem Zug, also erst danach fragen
+        if move_in_progress:
+            return
+        if tip_tween:
+            animator.cancel(tip_tween)
+            tip_tween=None
+        tip_highlight=None
+        tip_requested=True
+        hint_worker.request(board)
+        show_hint()
         return
 
     if hilfe_button_rect_global and hilfe_button_rect_global.collidepoint(x,y):
         if showing_help:
             showing_help=False
-            if help_sound:
-                help_sound.stop()
+            sound_effects.stop('help')
         else:
             showing_help=True
-            if help_sound:
-                help_sound.play()
+            sound_effects.play('help')
         return
 
     if musik_button_rect_global and musik_button_rect_global.collidepoint(x,y):
@@ -976,101 +1054,44 @@ def handle_button_click(pos):
         showing_top5=not showing_top5
         return
 
-def draw_grid(selected_positions=None, matched_positions=None, blink=False,
-              swapped_positions=None, swap_progress=0,
-              swapped_positions_positions=None, swapped_positions_destinations=None):
-    if adjusted_background_image:
-        screen.blit(adjusted_background_image,(0,0))
-    else:
-        screen.fill(BACKGROUND_COLOR)
-
-    if graphic_image:
-        screen.blit(graphic_image,graphic_rect)
-    elif text_surface and shadow_surface and text_rect:
-        sh_pos=(text_rect.x+shadow_offset[0], text_rect.y+shadow_offset[1])
-        screen.blit(shadow_surface,sh_pos)
-        screen.blit(text_surface,text_rect)
-
-    c_txt=f"Killed Xenobug Blocks: {blocks_cleared}"
-    c_s=counter_font.render(c_txt,True,(255,255,255))
-    sc_s=counter_font.render(c_txt,True,(0,0,0))
-    c_rect=c_s.get_rect()
-    c_rect.centerx=SCREEN_WIDTH//2
-    c_rect.top=BOARD_OFFSET_Y+BOARD_HEIGHT+10
-    sofs=(2,2)
-    sc_rect=c_rect.copy()
-    sc_rect.x+=sofs[0]
-    sc_rect.y+=sofs[1]
-    screen.blit(sc_s,sc_rect)
-    screen.blit(c_s,c_rect)
-
-    for y in range(GRID_SIZE):
-        for x in range(GRID_SIZE):
-            bt=grid[y][x]
-            if bt==-1:
-                continue
-            rect=pygame.Rect(BOARD_OFFSET_X+x*BLOCK_SIZE, BOARD_OFFSET_Y+y*BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE)
-
-            if swapped_positions and (y,x) in swapped_positions:
-                idx=swapped_positions.index((y,x))
-                st=swapped_positions_positions[idx]
-                ed=swapped_positions_destinations[idx]
-                dx=ed[0]-st[0]
-                dy=ed[1]-st[1]
-                cx=st[0]+dx*swap_progress
-                cy=st[1]+dy*swap_progress
-                rect.topleft=(cx,cy)
-
-            if matched_positions and (y,x) in matched_positions and not blink:
-                continue
-
-            alpha=int(255*transparency_value)
-            dark=pygame.Surface((BLOCK_SIZE,BLOCK_SIZE),pygame.SRCALPHA)
-            dark.fill((0,0,0,alpha))
-            screen.blit(dark,rect)
-
-            if block_images:
-                if use_colors_with_images:
-                    ac=adjust_color(COLORS[bt])
-                    c_sf=pygame.Surface((BLOCK_SIZE,BLOCK_SIZE),pygame.SRCALPHA)
-                    c_sf.fill(ac)
-                    screen.blit(c_sf,rect)
-                adj=adjusted_images_cache.get(bt)
-                if adj:
-                    screen.blit(adj,rect)
-                else:
-                    screen.blit(block_images[bt],rect)
-            else:
-                c=COLORS[bt]
-                ac=adjust_color(c)
-                c_sf=pygame.Surface((BLOCK_SIZE,BLOCK_SIZE),pygame.SRCALPHA)
-                c_sf.fill(ac)
-                screen.blit(c_sf,rect)
-
-            if selected_positions and (y,x) in selected_positions:
-                pygame.draw.rect(screen,(255,255,0),rect,3)
-            elif matched_positions and (y,x) in matched_positions:
-                pygame.draw.rect(screen,(0,255,0),rect,3)
-            elif tip_highlight and (y,x) in tip_highlight:
-                pygame.draw.rect(screen,(255,0,0),rect,3)
-
-    screen.blit(grid_lines_surface,(BOARD_OFFSET_X,BOARD_OFFSET_Y))
-
-    draw_buttons()
-    if sliders_visible:
-        draw_sliders()
-
-    if showing_help:
-        draw_help_panel()
-
-    if showing_top5:
-        draw_top5_panel()
+def draw_grid(selected_positions=None, matched_positions=None, blink=False, moved_cells=None):
+    """Zeichnet die Szene; nur Bereiche, die sich seit dem letzten Aufruf geändert haben.
+
+    Die Bereiche werden in pending_rects gesammelt und mit present() angezeigt.
+    """
+    global full_redraw, panel_state
+    if static_layer is None:
+        build_static_layer()
+
+    dirty=update_board_blits(selected_positions,matched_positions,blink,moved_cells)
+    dirty+=update_counter()
+
+    panels=(sliders_visible,saturation,brightness,contrast,hue,bg_brightness,transparency_value,
+            showing_help,showing_top5)
+    if panels!=panel_state:
+        dirty+=[slider_panel_rect(),help_panel_area(),side_panel_area(5)]
+        panel_state=panels
+    if showing_help and update_help_panel():
+        dirty.append(help_panel_area())
+    if showing_top5 and update_top5_panel():
+        dirty.append(side_panel_area(5))
+
+    if full_redraw:
+        dirty=[screen.get_rect()]
+        full_redraw=False
+    if not dirty:
+        return
+    if len(dirty)>MAX_DIRTY_RECTS:
+        dirty=[dirty[0].unionall(dirty[1:])]
+    for rect in dirty:
+        draw_region(rect)
+    pending_rects.extend(dirty)
 
 def no_more_moves():
-    txt=font.render("No more moves possible ! Another try ? (j/n)",True,(255,255,255))
-    sh_txt=font.render("No more moves possible ! Another try ? (j/n)",True,(0,0,0))
-    retry_txt=font.render("",True,(255,255,255))  
-    sh_retry=font.render("",True,(0,0,0))         
+    txt=text_cache.render(font,"No more moves possible ! Another try ? (j/n)",(255,255,255))
+    sh_txt=text_cache.render(font,"No more moves possible ! Another try ? (j/n)",(0,0,0))
+    retry_txt=text_cache.render(font,"",(255,255,255))  
+    sh_retry=text_cache.render(font,"",(0,0,0))         
 
     t_rect=txt.get_rect()
     t_rect.centerx=SCREEN_WIDTH//2
@@ -1093,26 +1114,13 @@ def no_more_moves():
     screen.blit(sh_retry,s_r_rect)
     screen.blit(retry_txt,r_rect)
     pygame.display.flip()
-
-    end_time=time.time()
-    spent_time=end_time - start_time
-    add_highscore(blocks_cleared,spent_time)
-
-    waiting=True
-    while waiting:
-        for event in pygame.event.get():
-            if event.type==pygame.KEYDOWN:
-                if event.key==pygame.K_j:
-                    create_grid()
-                    waiting=False
-                elif event.key==pygame.K_n:
-                    fade_out_and_quit()
-            elif event.type==pygame.QUIT:
-                fade_out_and_quit()
+    pending_rects.clear()
+    # Beim nächsten Frame alles neu zeichnen, sonst bleibt der Text stehen
+    mark_full_redraw()
 
 def show_exit_prompt():
-    ex_txt=font.render("Exit Game j/n",True,(255,255,255))
-    sh_ex_txt=font.render("Exit Game j/n",True,(0,0,0))
+    ex_txt=text_cache.render(font,"Exit Game j/n",(255,255,255))
+    sh_ex_txt=text_cache.render(font,"Exit Game j/n",(0,0,0))
 
     t_rect=ex_txt.get_rect()
     t_rect.centerx=SCREEN_WIDTH//2
@@ -1125,11 +1133,13 @@ def show_exit_prompt():
     screen.blit(sh_ex_txt,sh_rect)
     screen.blit(ex_txt,t_rect)
     pygame.display.flip()
+    pending_rects.clear()
+    # Beim nächsten Frame alles neu zeichnen, sonst bleibt der Text stehen
+    mark_full_redraw()
 
 def fade_out_and_quit():
-    if tschuess_sound:
-        tschuess_sound.play()
-    pygame.mixer.music.fadeout(5000)
+    sound_effects.play('tschuess')
+    music_player.stop(fadeout_ms=5000)
     fd_s=pygame.Surface((SCREEN_WIDTH,SCREEN_HEIGHT))
     fd_s=fd_s.convert_alpha()
     for alpha in range(0,255,5):
@@ -1137,144 +1147,135 @@ def fade_out_and_quit():
         screen.blit(fd_s,(0,0))
         pygame.display.flip()
         pygame.time.delay(100)
+    highscores.flush()
     pygame.quit()
     sys.exit()
 
+def handle_mouse_click(pos):
+    global selected_block, sliders_visible, showing_help, showing_top5
+    x,y=pos
+    # Zuerst Buttonklick prüfen
+    handle_button_click((x,y))
+
+    # Falls Slider offen => Klick in slider?
+    if sliders_visible:
+        if slider_panel_rect().collidepoint(x,y):
+            handle_slider_click((x,y))
+            return
+
+    # Schließe Menüs, falls Klick NICHT in Buttons/Panels
+    if not (grafik_button_rect_global and grafik_button_rect_global.collidepoint(x,y)) \
+       and not (tip_button_rect_global and tip_button_rect_global.collidepoint(x,y)) \
+       and not (hilfe_button_rect_global and hilfe_button_rect_global.collidepoint(x,y)) \
+       and not (musik_button_rect_global and musik_button_rect_global.collidepoint(x,y)) \
+       and not (top5_button_rect_global and top5_button_rect_global.collidepoint(x,y)):
+
+        if sliders_visible and not slider_panel_rect().collidepoint(x,y):
+            sliders_visible=False
+
+        if showing_help:
+            if not side_panel_rect(6).collidepoint(x,y):
+                showing_help=False
+                sound_effects.stop('help')
+
+        if showing_top5:
+            if not side_panel_rect(5).collidepoint(x,y):
+                showing_top5=False
+
+    # Während ein Zug abläuft, nimmt das Spielfeld keine Klicks an
+    if move_in_progress:
+        return
+
+    # Board-Klick => Move
+    grid_x=(x-BOARD_OFFSET_X)//BLOCK_SIZE
+    grid_y=(y-BOARD_OFFSET_Y)//BLOCK_SIZE
+    if 0<=grid_x<GRID_SIZE and 0<=grid_y<GRID_SIZE:
+        if selected_block:
+            y1,x1=selected_block
+            if abs(y1-grid_y)+abs(x1-grid_x)==1:
+                start_move(selected_block,(grid_y,grid_x))
+                selected_block=None
+            else:
+                selected_block=(grid_y,grid_x)
+        else:
+            selected_block=(grid_y,grid_x)
+
+def end_game():
+    """Ergebnis speichern; die Hauptschleife zeigt dann die Frage nach einem neuen Spiel."""
+    global game_over
+    spent_time=time.time()-start_time
+    highscores.add(blocks_cleared,spent_time)
+    game_over=True
+
 def main():
-    global start_time
+    global start_time, exit_prompt, game_over
     start_time=time.time()
 
     create_grid()
-    if block_images:
-        adjust_and_cache_images()
+    adjust_and_cache_images()
     adjust_background_image()
 
-    running=True
-    global selected_block,blocks_cleared,exit_prompt
-    global sliders_visible, showing_help, showing_top5
+    sound_effects.play('hello')
 
-    if hello_sound:
-        hello_sound.play()
+    draw_grid()
+    present()
 
-    while running:
-        clock.tick(60)
+    # Eine Schleife für alles: Animationen laufen über den animator weiter,
+    # Eingaben werden in jedem Frame verarbeitet. Läuft keine Animation,
+    # schläft sie bis zur nächsten Eingabe, dem Ende eines Musiktitels oder
+    # IDLE_TIMEOUT_MS (Hilfe-Datei prüfen, Musik nachladen).
+    while True:
+        if animator.active:
+            clock.tick(60)
+            events=pygame.event.get()
+        else:
+            event=pygame.event.wait(IDLE_TIMEOUT_MS)
+            events=[] if event.type==pygame.NOEVENT else [event]+pygame.event.get()
         check_music_end()
+        animator.update(pygame.time.get_ticks())
 
-        if exit_prompt:
-            draw_grid()
-            show_exit_prompt()
-            pygame.display.flip()
-            for event in pygame.event.get():
+        for event in events:
+            if event.type==pygame.QUIT:
+                fade_out_and_quit()
+            elif event.type in (pygame.VIDEOEXPOSE,pygame.WINDOWEXPOSED):
+                mark_full_redraw()
+            elif game_over:
+                if event.type==pygame.KEYDOWN:
+                    if event.key==pygame.K_j:
+                        create_grid()
+                        game_over=False
+                    elif event.key==pygame.K_n:
+                        fade_out_and_quit()
+            elif exit_prompt:
                 if event.type==pygame.KEYDOWN:
                     if event.key==pygame.K_j:
                         fade_out_and_quit()
                     elif event.key==pygame.K_n:
                         exit_prompt=False
-                elif event.type==pygame.QUIT:
-                    fade_out_and_quit()
+            elif event.type==pygame.KEYDOWN:
+                if event.key==pygame.K_ESCAPE:
+                    exit_prompt=True
+                elif event.key==pygame.K_SPACE:
+                    # Laufenden Zug sofort zu Ende spielen
+                    animator.finish_all()
+            elif event.type==pygame.MOUSEBUTTONDOWN:
+                handle_mouse_click(event.pos)
+
+        if not game_over and not exit_prompt and not move_in_progress and not board.has_possible_moves():
+            end_game()
+        if not game_over and not move_in_progress:
+            # Den nächsten Tip schon rechnen, während der Spieler überlegt
+            hint_worker.request(board)
+        show_hint()
+
+        draw_grid(selected_positions=[selected_block] if selected_block else None,
+                  matched_positions=anim_matched,blink=anim_blink,moved_cells=anim_moved_cells)
+        if game_over:
+            no_more_moves()
+        elif exit_prompt:
+            show_exit_prompt()
         else:
-            draw_grid(selected_positions=[selected_block] if selected_block else None)
-            pygame.display.flip()
-
-            if not has_possible_moves():
-                no_more_moves()
-                continue
-
-            for event in pygame.event.get():
-                if event.type==pygame.QUIT:
-                    fade_out_and_quit()
-                elif event.type==pygame.KEYDOWN:
-                    if event.key==pygame.K_ESCAPE:
-                        exit_prompt=True
-                elif event.type==pygame.MOUSEBUTTONDOWN:
-                    x,y=event.pos
-                    # Zuerst Buttonklick prüfen
-                    handle_button_click((x,y))
-
-                    # Falls Slider offen => Klick in slider?
-                    if sliders_visible:
-                        total_slider_height=6*SLIDER_HEIGHT+5*SLIDER_SPACING
-                        slider_panel_rect=pygame.Rect(
-                            SLIDER_OFFSET_X-max_label_width-5,
-                            SLIDER_OFFSET_Y,
-                            SLIDER_WIDTH+max_label_width+10,
-                            total_slider_height
-                        )
-                        if slider_panel_rect.collidepoint(x,y):
-                            handle_slider_click((x,y))
-                            continue
-
-                    # Schließe Menüs, falls Klick NICHT in Buttons/Panels
-                    if not (grafik_button_rect_global and grafik_button_rect_global.collidepoint(x,y)) \
-                       and not (tip_button_rect_global and tip_button_rect_global.collidepoint(x,y)) \
-                       and not (hilfe_button_rect_global and hilfe_button_rect_global.collidepoint(x,y)) \
-                       and not (musik_button_rect_global and musik_button_rect_global.collidepoint(x,y)) \
-                       and not (top5_button_rect_global and top5_button_rect_global.collidepoint(x,y)):
-
-                        if sliders_visible and not slider_panel_rect.collidepoint(x,y):
-                            sliders_visible=False
-
-                        if showing_help:
-                            panel_width=300
-                            panel_start_y=BUTTON_OFFSET_Y+6*(BUTTON_HEIGHT+BUTTON_SPACING)+10
-                            panel_height=SCREEN_HEIGHT - panel_start_y - MARGIN
-                            panel_x=SCREEN_WIDTH - panel_width - MARGIN
-                            help_rect=pygame.Rect(panel_x,panel_start_y,panel_width,panel_height)
-                            if not help_rect.collidepoint(x,y):
-                                showing_help=False
-                                if help_sound:
-                                    help_sound.stop()
-
-                        if showing_top5:
-                            panel_width=300
-                            panel_start_y=BUTTON_OFFSET_Y+5*(BUTTON_HEIGHT+BUTTON_SPACING)+10
-                            panel_height=SCREEN_HEIGHT - panel_start_y - MARGIN
-                            panel_x=SCREEN_WIDTH - panel_width - MARGIN
-                            top5_rect=pygame.Rect(panel_x,panel_start_y,panel_width,panel_height)
-                            if not top5_rect.collidepoint(x,y):
-                                showing_top5=False
-
-                    # Board-Klick => Move
-                    grid_x=(x-BOARD_OFFSET_X)//BLOCK_SIZE
-                    grid_y=(y-BOARD_OFFSET_Y)//BLOCK_SIZE
-                    if 0<=grid_x<GRID_SIZE and 0<=grid_y<GRID_SIZE:
-                        if selected_block:
-                            y1,x1=selected_block
-                            if abs(y1-grid_y)+abs(x1-grid_x)==1:
-                                animate_swap(selected_block,(grid_y,grid_x))
-                                swap_blocks(selected_block,(grid_y,grid_x))
-                                matches=find_matches()
-                                if matches:
-                                    while True:
-                                        matches=find_matches()
-                                        if not matches:
-                                            break
-                                        match_length=len(set(matches))
-                                        if match_length>=5 and five_match_sound:
-                                            five_match_sound.play()
-                                        elif match_length==4 and four_match_sound:
-                                            four_match_sound.play()
-                                        elif match_sound:
-                                            match_sound.play()
-                                        blocks_cleared+=match_length
-                                        animate_matches(matches)
-                                        for y_m,x_m in matches:
-                                            grid[y_m][x_m]=-1
-                                        collapse_grid()
-                                else:
-                                    animate_swap(selected_block,(grid_y,grid_x))
-                                    swap_blocks(selected_block,(grid_y,grid_x))
-                                    if swap_fail_sound:
-                                        swap_fail_sound.play()
-                                selected_block=None
-                            else:
-                                selected_block=(grid_y,grid_x)
-                        else:
-                            selected_block=(grid_y,grid_x)
-
-            draw_grid(selected_positions=[selected_block] if selected_block else None)
-            pygame.display.flip()
-    pygame.quit()
+            present()
 
 if __name__=="__main__":
-    main()
+    run()
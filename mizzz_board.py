@@ -0,0 +1,465 @@
+"""Board state and the rules of the game, independent of the display.
+
+The Board holds its own grid and implements swapping, match detection,
+collapsing/refilling and move enumeration. It does not touch the display,
+so it can be used from tools, benchmarks and worker processes.
+"""
+import collections
+import functools
+
+import numpy as np
+
+from mizzz_bitboard import BitBoard, int_to_mask
+
+EMPTY = -1
+NEIGHBOURS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BACKENDS = ('array', 'bitboard')
+
+# Drei gleiche Blöcke, die ein Tausch zu einer Reihe macht, z.B.
+#   A A . .     A . A     A A . A
+#   . . A .     . A .
+MOVE_PATTERNS = [
+    [(0, 0), (0, 1), (1, 2)], [(1, 0), (1, 1), (0, 2)], [(0, 1), (0, 2), (1, 0)], [(1, 1), (1, 2), (0, 0)],
+    [(0, 0), (0, 2), (1, 1)], [(1, 0), (1, 2), (0, 1)], [(0, 0), (0, 1), (0, 3)], [(0, 0), (0, 2), (0, 3)],
+]
+# Dieselben Muster senkrecht
+PATTERNS = MOVE_PATTERNS + [[(x, y) for y, x in cells] for cells in MOVE_PATTERNS]
+# Versuche pro fehlendem Zug, bevor generate() aufgibt
+PLANT_TRIES = 50
+
+
+def run_starts(grid):
+    """Return (h, v) boolean arrays marking where runs of 3 begin.
+
+    h[..., y, x] is set when cells x, x+1, x+2 of row y hold the same block,
+    v[..., y, x] likewise for rows y, y+1, y+2 of column x. Works on a single
+    grid or on a stack of grids (leading axes are kept).
+    """
+    filled = grid != EMPTY
+    eq = (grid[..., :, :-1] == grid[..., :, 1:]) & filled[..., :, 1:]
+    h = eq[..., :, :-1] & eq[..., :, 1:]
+    eq = (grid[..., :-1, :] == grid[..., 1:, :]) & filled[..., 1:, :]
+    v = eq[..., :-1, :] & eq[..., 1:, :]
+    return h, v
+
+
+def match_mask(grid):
+    """Return a boolean mask of all cells in a horizontal or vertical run of 3+.
+
+    The runs are found with shifted-slice comparisons, so the cost does not
+    depend on Python loops over the cells.
+    """
+    h, v = run_starts(grid)
+    mask = np.zeros(grid.shape, dtype=bool)
+    mask[..., :, :-2] |= h
+    mask[..., :, 1:-1] |= h
+    mask[..., :, 2:] |= h
+    mask[..., :-2, :] |= v
+    mask[..., 1:-1, :] |= v
+    mask[..., 2:, :] |= v
+    return mask
+
+
+def has_runs(grid):
+    """Like match_mask(grid).any() per grid, without building the mask."""
+    h, v = run_starts(grid)
+    return h.any(axis=(-2, -1)) | v.any(axis=(-2, -1))
+
+
+def mask_to_cells(mask):
+    ys, xs = np.nonzero(mask)
+    return list(zip(ys.tolist(), xs.tolist()))
+
+
+def match_groups(grid, cells):
+    """Sizes of the groups of touching same-type cells among cells, largest first."""
+    left = set(cells)
+    sizes = []
+    while left:
+        stack = [left.pop()]
+        size = 0
+        while stack:
+            y, x = stack.pop()
+            size += 1
+            for dy, dx in NEIGHBOURS:
+                cell = (y + dy, x + dx)
+                if cell in left and grid[cell] == grid[y, x]:
+                    left.remove(cell)
+                    stack.append(cell)
+        sizes.append(size)
+    return sorted(sizes, reverse=True)
+
+
+# Ein Schritt einer Kaskade: die gelöschten Zellen, die Größen ihrer Gruppen,
+# die gefallenen Blöcke als ((from_y, x), (to_y, x)) und die neuen Blöcke als
+# ((y, x), block_type)
+CascadeStep = collections.namedtuple('CascadeStep', 'cleared groups moves spawned')
+
+
+@functools.lru_cache(maxsize=None)
+def candidate_move_array(size):
+    """All pairs of neighbouring cells as an (n, 4) array of y1, x1, y2, x2."""
+    moves = []
+    for y in range(size):
+        for x in range(size):
+            if x + 1 < size:
+                moves.append((y, x, y, x + 1))
+            if y + 1 < size:
+                moves.append((y, x, y + 1, x))
+    moves = np.array(moves, dtype=np.intp)
+    moves.setflags(write=False)
+    return moves
+
+
+@functools.lru_cache(maxsize=None)
+def affected_moves(size):
+    """For every cell (flat index y*size+x) the candidate moves it can influence.
+
+    Whether a move is legal only depends on the row and column through each of
+    its two cells, up to two cells away, so a change to one cell can only flip
+    the moves that have an endpoint within that distance.
+    """
+    moves = candidate_move_array(size)
+    touching = [[] for _ in range(size * size)]
+    for i, (y1, x1, y2, x2) in enumerate(moves.tolist()):
+        for y, x in ((y1, x1), (y2, x2)):
+            for d in range(-2, 3):
+                if 0 <= y + d < size:
+                    touching[(y + d) * size + x].append(i)
+                if d and 0 <= x + d < size:
+                    touching[y * size + x + d].append(i)
+    return [np.unique(np.array(t, dtype=np.intp)) for t in touching]
+
+
+WINDOW = np.arange(-2, 3)
+
+
+def creates_match(grid, moves):
+    """For each move, whether it puts one of the two swapped cells into a run of 3+.
+
+    Only the five cells of the row and of the column centred on each swapped
+    cell can take part in such a run, so every move is checked on four small
+    windows instead of a full board scan.
+    """
+    padded = np.pad(grid, 2, constant_values=EMPTY)
+    shape = (len(moves), len(WINDOW))
+    y1, x1, y2, x2 = (c[:, np.newaxis] for c in moves.T)
+    # Fenster: Zeile/Spalte um Zelle 1, dann Zeile/Spalte um Zelle 2
+    wy = np.stack((np.broadcast_to(y1, shape), y1 + WINDOW, np.broadcast_to(y2, shape), y2 + WINDOW), axis=1)
+    wx = np.stack((x1 + WINDOW, np.broadcast_to(x1, shape), x2 + WINDOW, np.broadcast_to(x2, shape)), axis=1)
+    values = padded[wy + 2, wx + 2]
+    y1, x1, y2, x2 = (c[:, np.newaxis] for c in (y1, x1, y2, x2))
+    values = np.where((wy == y1) & (wx == x1), padded[y2 + 2, x2 + 2], values)
+    values = np.where((wy == y2) & (wx == x2), padded[y1 + 2, x1 + 2], values)
+    w0, w1, c, w3, w4 = np.moveaxis(values, -1, 0)
+    runs = (c != EMPTY) & (((w0 == c) & (w1 == c)) | ((w1 == c) & (w3 == c)) | ((w3 == c) & (w4 == c)))
+    return runs.any(axis=1)
+
+
+def line_runs(values):
+    """Return the indices of values that are part of a run of 3+."""
+    found = []
+    start = 0
+    for i in range(1, len(values) + 1):
+        if i == len(values) or values[i] != values[start]:
+            if i - start >= 3 and values[start] != EMPTY:
+                found.extend(range(start, i))
+            start = i
+    return found
+
+
+class Board:
+    """Spielfeld with its rules.
+
+    backend selects how matches and legal moves are computed: 'array' works
+    on the ndarray grid, 'bitboard' on one bitmask per block type kept next
+    to it. With cross_check=True every bitboard result is compared with the
+    array result and a mismatch raises AssertionError.
+    """
+
+    def __init__(self, size=10, num_types=8, seed=None, backend='array', cross_check=False):
+        self.size = size
+        self.num_types = num_types
+        self.rng = np.random.default_rng(seed)
+        self.cross_check = cross_check
+        self.set_backend(backend)
+        self.grid = np.full((size, size), EMPTY, dtype=np.int8)
+
+    @property
+    def grid(self):
+        return self._grid
+
+    @grid.setter
+    def grid(self, value):
+        # Neuer Grid => Zugindex komplett neu aufbauen
+        self._grid = value
+        self._bits = None
+        self._legal = None
+        self._move_count = 0
+        self._dirty = set()
+
+    @property
+    def bits(self):
+        """The BitBoard mirror of the grid, built on first use."""
+        if self._bits is None:
+            self._bits = BitBoard.from_grid(self.grid, self.num_types)
+        return self._bits
+
+    def set_backend(self, backend):
+        if backend not in BACKENDS:
+            raise ValueError(f'Unknown board backend: {backend}')
+        self.backend = backend
+        self._legal = None
+
+    def copy(self):
+        other = Board(self.size, self.num_types, backend=self.backend, cross_check=self.cross_check)
+        other.rng.bit_generator.state = self.rng.bit_generator.state
+        other.grid = self.grid.copy()
+        if self._bits is not None:
+            other._bits = self._bits.copy()
+        return other
+
+    def _changed(self, cells):
+        if self._legal is not None:
+            self._dirty.update(cells)
+
+    def _update_move_index(self):
+        """Bring the legal-move index up to date with the grid.
+
+        Only moves near cells changed since the last update are re-evaluated.
+        """
+        moves = candidate_move_array(self.size)
+        if self.backend == 'bitboard':
+            if self._legal is None or self._dirty:
+                self._legal = self.bits.legal_move_flags(moves)
+                self._move_count = int(self._legal.sum())
+                if self.cross_check:
+                    self._check_moves(moves)
+        elif self._legal is None:
+            self._legal = creates_match(self.grid, moves)
+            self._move_count = int(self._legal.sum())
+        elif self._dirty:
+            affected = affected_moves(self.size)
+            idx = np.unique(np.concatenate([affected[y * self.size + x] for y, x in self._dirty]))
+            flags = creates_match(self.grid, moves[idx])
+            self._move_count += int(flags.sum()) - int(self._legal[idx].sum())
+            self._legal[idx] = flags
+        self._dirty.clear()
+
+    def _check_moves(self, moves):
+        # Auf Feldern mit fertigen Reihen zählen beide Varianten gleichfarbige
+        # Tausche unterschiedlich, deshalb nur beruhigte Felder vergleichen
+        if has_runs(self.grid):
+            return
+        expected = creates_match(self.grid, moves)
+        if not np.array_equal(self._legal, expected):
+            wrong = moves[self._legal != expected].tolist()
+            raise AssertionError(f'Bitboard legal moves differ from grid at {wrong}')
+
+    def random_types(self, count):
+        return self.rng.integers(0, self.num_types, size=count, dtype=np.int8)
+
+    def generate(self, min_moves=5, seed=None):
+        """Build a new board without runs and with at least min_moves legal moves.
+
+        The cells are filled one by one, each with a random type that does
+        not complete a run with the two cells to its left or above it. If
+        that leaves fewer than min_moves moves, "one swap away" patterns are
+        planted at random places until there are enough. Both steps take a
+        bounded number of tries, so the time grows with the board size and
+        not with bad luck. Returns the number of legal moves, which is only
+        below min_moves if the board is too small to hold that many. seed
+        restarts the random generator.
+
+        Raises ValueError for fewer than 3 block types, where a board
+        without runs cannot be guaranteed.
+        """
+        if self.num_types < 3:
+            raise ValueError(f'At least 3 block types are needed, got {self.num_types}')
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.grid = self._construct()
+        count = self.move_count()
+        for _ in range(PLANT_TRIES * max(0, min_moves - count)):
+            if count >= min_moves:
+                break
+            count = self._plant_move(count)
+        return count
+
+    def _construct(self):
+        size, num_types = self.size, self.num_types
+        rows = []
+        draws = self.rng.random((size, size)).tolist()
+        for y in range(size):
+            row = []
+            for x in range(size):
+                banned = set()
+                if x >= 2 and row[x - 1] == row[x - 2]:
+                    banned.add(row[x - 1])
+                if y >= 2 and rows[y - 1][x] == rows[y - 2][x]:
+                    banned.add(rows[y - 1][x])
+                # Gleichverteilt unter den erlaubten Typen: Index ziehen und
+                # über die verbotenen hinwegzählen
+                t = int(draws[y][x] * (num_types - len(banned)))
+                for b in sorted(banned):
+                    if t >= b:
+                        t += 1
+                row.append(t)
+            rows.append(row)
+        return np.array(rows, dtype=np.int8)
+
+    def _plant_move(self, count):
+        """Try one random move pattern; keep it if it adds moves without creating a run."""
+        cells = PATTERNS[self.rng.integers(len(PATTERNS))]
+        height = max(y for y, _ in cells) + 1
+        width = max(x for _, x in cells) + 1
+        if height > self.size or width > self.size:
+            return count
+        oy = int(self.rng.integers(self.size - height + 1))
+        ox = int(self.rng.integers(self.size - width + 1))
+        cells = [(oy + y, ox + x) for y, x in cells]
+        old = [int(self.grid[c]) for c in cells]
+        self._set_cells(cells, [int(self.rng.integers(self.num_types))] * len(cells))
+        new_count = self.move_count()
+        if new_count > count and not has_runs(self.grid):
+            return new_count
+        self._set_cells(cells, old)
+        return self.move_count()
+
+    def _set_cells(self, cells, values):
+        for cell, value in zip(cells, values):
+            self.grid[cell] = value
+        self._bits = None
+        self._changed(cells)
+
+    def find_match_mask(self):
+        if self.backend != 'bitboard':
+            return match_mask(self.grid)
+        mask = int_to_mask(self.bits.match_bits(), self.size)
+        if self.cross_check and not np.array_equal(mask, match_mask(self.grid)):
+            raise AssertionError('Bitboard matches differ from grid')
+        return mask
+
+    def find_matches(self):
+        """Return all matched cells as a list of (y, x) tuples.
+
+        Compatibility wrapper around find_match_mask().
+        """
+        return mask_to_cells(self.find_match_mask())
+
+    def matches_at(self, pos1, pos2):
+        """Return the matched cells on the rows and columns through pos1 and pos2.
+
+        Meant to be called right after swap(pos1, pos2): only those lines can
+        have changed, so on a board without runs before the swap the result
+        is the same as find_matches(), at O(size) instead of O(size**2).
+        """
+        grid = self.grid
+        cells = set()
+        for y in {pos1[0], pos2[0]}:
+            cells.update((y, x) for x in line_runs(grid[y].tolist()))
+        for x in {pos1[1], pos2[1]}:
+            cells.update((y, x) for y in line_runs(grid[:, x].tolist()))
+        return list(cells)
+
+    def swap(self, pos1, pos2):
+        grid = self.grid
+        grid[pos1], grid[pos2] = grid[pos2], grid[pos1]
+        if self._bits is not None:
+            self._bits.swap(pos1, pos2)
+        self._changed((tuple(pos1), tuple(pos2)))
+
+    def clear(self, cells):
+        """Empty the given cells, either a boolean mask or a list of (y, x)."""
+        if isinstance(cells, np.ndarray):
+            cells = mask_to_cells(cells)
+        for y, x in cells:
+            self.grid[y, x] = EMPTY
+        if self._bits is not None:
+            self._bits.clear(cells)
+        self._changed(cells)
+
+    def collapse(self):
+        """Let blocks fall into EMPTY cells and spawn new ones on top.
+
+        Returns (moves, spawned) as in CascadeStep.
+        """
+        moves = []
+        spawned = []
+        missing_per_column = (self.grid == EMPTY).sum(axis=0)
+        for x in np.nonzero(missing_per_column)[0].tolist():
+            column = self.grid[:, x]
+            rows = np.nonzero(column != EMPTY)[0].tolist()
+            missing = self.size - len(rows)
+            lowest = int(np.nonzero(column == EMPTY)[0][-1])
+            new = self.random_types(missing)
+            # Die übrigen Blöcke rutschen in ihrer Reihenfolge nach unten
+            moves.extend(((y, x), (missing + i, x)) for i, y in enumerate(rows) if missing + i != y)
+            spawned.extend(((y, x), t) for y, t in enumerate(new.tolist()))
+            self.grid[:, x] = np.concatenate((new, column[rows]))
+            self._changed((y, x) for y in range(lowest + 1))
+        if spawned:
+            self._bits = None
+        return moves, spawned
+
+    def refill(self):
+        """Like collapse(); returns the set of columns that received new blocks."""
+        _, spawned = self.collapse()
+        return {x for (_, x), _ in spawned}
+
+    def resolve(self, max_steps=1000):
+        """Clear all runs and refill until none are left; returns the CascadeStep list.
+
+        Nothing is drawn, so this runs as fast as the rules allow (hints,
+        simulations). max_steps only guards against boards that can never
+        calm down, such as a single block type.
+        """
+        steps = []
+        for _ in range(max_steps):
+            mask = self.find_match_mask()
+            if not mask.any():
+                break
+            cleared = mask_to_cells(mask)
+            groups = match_groups(self.grid, cleared)
+            self.clear(cleared)
+            moves, spawned = self.collapse()
+            steps.append(CascadeStep(cleared, groups, moves, spawned))
+        return steps
+
+    def apply_move(self, pos1, pos2):
+        """Swap pos1 and pos2 and resolve the whole cascade; returns its CascadeStep list.
+
+        If the swap makes no match it is undone and the list is empty.
+        """
+        self.swap(pos1, pos2)
+        if not self.matches_at(pos1, pos2):
+            self.swap(pos1, pos2)
+            return []
+        return self.resolve()
+
+    def legal_move_flags(self):
+        """Return the candidate_move_array() of this size and which moves are legal.
+
+        A move is legal when it puts one of the swapped cells into a run of 3+.
+        The flags come from an index that is only refreshed around cells that
+        changed, so repeated queries on an unchanged board cost nothing.
+        """
+        self._update_move_index()
+        return candidate_move_array(self.size), self._legal
+
+    def legal_moves(self):
+        moves, flags = self.legal_move_flags()
+        for y1, x1, y2, x2 in moves[flags].tolist():
+            yield (y1, x1), (y2, x2)
+
+    def move_count(self):
+        self._update_move_index()
+        return self._move_count
+
+    def has_possible_moves(self, min_moves=1):
+        return self.move_count() >= min_moves
+
+    def find_possible_move(self):
+        for pos1, pos2 in self.legal_moves():
+            return [pos1, pos2]
+        return None
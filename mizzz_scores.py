@@ -0,0 +1,326 @@
+"""The highscore list and the history of played games.
+
+ScoreDatabase is the complete game history in SQLite: every finished game
+is appended, and the leaderboards are index range scans. top5.txt, the old
+text format, can be imported into it once.
+
+HighscoreStore keeps the current top list in memory. New games are written
+by a background thread (write-behind), so a slow home directory never
+stalls a frame: into the ScoreDatabase if there is one, otherwise into
+top5.txt, through a temporary file that is then renamed over it, so the
+file is always either the old or the new list.
+"""
+import atexit
+import datetime
+import getpass
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+
+# Format einer Zeile: blocks ; date ; time ; spent ; user
+FIELDS = 5
+
+
+def parse_highscores(lines):
+    """Return the (blocks, date, time, spent, user) entries of top5.txt lines."""
+    entries = []
+    for line in lines:
+        parts = line.strip().split(';')
+        if len(parts) != FIELDS:
+            continue
+        try:
+            blocks = int(parts[0].strip())
+            spent = float(parts[3].strip())
+        except ValueError:
+            continue
+        entries.append((blocks, parts[1].strip(), parts[2].strip(), spent, parts[4].strip()))
+    return entries
+
+
+def format_highscores(entries):
+    return ''.join(f"{blocks};{datum};{zeit};{spent:.2f};{user}\n"
+                   for blocks, datum, zeit, spent, user in entries)
+
+
+def load_highscores(path, limit=5):
+    """Read the best `limit` entries (fewest blocks first) from path."""
+    if not os.path.isfile(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = parse_highscores(f)
+    entries.sort(key=lambda e: e[0])
+    return entries[:limit]
+
+
+def save_highscores(path, entries):
+    """Write entries to path atomically (temporary file + os.replace)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.top5-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(format_highscores(entries))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    blocks INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    user TEXT NOT NULL,
+    played_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_by_blocks ON games (blocks, duration, played_at);
+CREATE INDEX IF NOT EXISTS games_by_duration ON games (duration);
+CREATE INDEX IF NOT EXISTS games_by_user ON games (user, blocks, duration);
+CREATE INDEX IF NOT EXISTS games_by_date ON games (played_at);
+CREATE TRIGGER IF NOT EXISTS games_no_update BEFORE UPDATE ON games
+BEGIN SELECT RAISE(ABORT, 'score history is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS games_no_delete BEFORE DELETE ON games
+BEGIN SELECT RAISE(ABORT, 'score history is append-only'); END;
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    imported_at TEXT NOT NULL,
+    games INTEGER NOT NULL
+);
+"""
+
+# Rangfolge: weniger Blöcke zuerst, bei Gleichstand die kürzere Dauer
+RANKING = 'ORDER BY blocks, duration, id LIMIT ?'
+COLUMNS = 'blocks, played_at, duration, user'
+# Ein Spiel über games_by_date holen und einsortieren kostet etwa so viel wie
+# 30 Schritte entlang games_by_blocks (gemessen mit 1 Mio. Spielen)
+DATE_ROW_COST = 30
+
+
+def timestamp(now=None):
+    return (now or datetime.datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def parse_timestamp(text, default=None):
+    try:
+        return datetime.datetime.fromisoformat(text)
+    except ValueError:
+        return default
+
+
+def row_to_entry(row):
+    """(blocks, played_at, duration, user) row -> top5.txt style entry."""
+    blocks, played_at, duration, user = row
+    datum, _, zeit = played_at.partition(' ')
+    return (blocks, datum, zeit, duration, user)
+
+
+class ScoreDatabase:
+    """Append-only history of all games in an SQLite file.
+
+    The leaderboard queries return entries in the same (blocks, date, time,
+    spent, user) form as load_highscores(). Time windows are given as
+    datetime objects or 'YYYY-MM-DD[ HH:MM:SS]' strings; start is inclusive,
+    end exclusive. The connection may be used from several threads, calls
+    are serialized.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def add(self, blocks, duration, user=None, played_at=None):
+        self.add_many([(blocks, duration, user, played_at)])
+
+    def _insert(self, games):
+        rows = [(blocks, duration, user or getpass.getuser(),
+                 played_at if isinstance(played_at, str) else timestamp(played_at))
+                for blocks, duration, user, played_at in games]
+        self._db.executemany('INSERT INTO games (blocks, duration, user, played_at) VALUES (?, ?, ?, ?)', rows)
+
+    def add_many(self, games):
+        """Append (blocks, duration, user, played_at) games in one transaction.
+
+        user defaults to the current login, played_at to now.
+        """
+        with self._lock, self._db:
+            self._insert(games)
+
+    def count(self):
+        return self._query('SELECT COUNT(*) FROM games')[0][0]
+
+    def top(self, limit=5):
+        return [row_to_entry(r) for r in self._query(f'SELECT {COLUMNS} FROM games {RANKING}', (limit,))]
+
+    def top_for_user(self, user, limit=5):
+        rows = self._query(f'SELECT {COLUMNS} FROM games WHERE user = ? {RANKING}', (user, limit))
+        return [row_to_entry(r) for r in rows]
+
+    def top_between(self, start=None, end=None, limit=5):
+        if start is None and end is None:
+            return self.top(limit)
+        start = '' if start is None else start if isinstance(start, str) else timestamp(start)
+        end = '\uffff' if end is None else end if isinstance(end, str) else timestamp(end)
+        # Schmale Zeitfenster: alle Spiele darin über games_by_date holen und
+        # sortieren. Breite Fenster: games_by_blocks in Rangfolge durchlaufen,
+        # bis limit Spiele im Fenster liegen.
+        if self._window_rows(start, end) ** 2 * DATE_ROW_COST > limit * self._rows():
+            source = 'games INDEXED BY games_by_blocks WHERE +played_at >= ? AND +played_at < ?'
+        else:
+            source = 'games WHERE played_at >= ? AND played_at < ?'
+        rows = self._query(f'SELECT {COLUMNS} FROM {source} {RANKING}', (start, end, limit))
+        return [row_to_entry(r) for r in rows]
+
+    def _rows(self):
+        # Append-only: die höchste id ist die Anzahl der Zeilen, ohne Scan
+        return self._query('SELECT MAX(id) FROM games')[0][0] or 0
+
+    def _window_rows(self, start, end):
+        """Estimated number of games from start to end, assuming evenly spread dates."""
+        first, last = self._query('SELECT (SELECT MIN(played_at) FROM games), (SELECT MAX(played_at) FROM games)')[0]
+        if first is None:
+            return 0
+        first, last = parse_timestamp(first), parse_timestamp(last)
+        span = (last - first).total_seconds()
+        lo = max(first, parse_timestamp(start, first))
+        hi = min(last, parse_timestamp(end, last))
+        if span <= 0:
+            return self._rows() if lo <= hi else 0
+        return self._rows() * max(0.0, (hi - lo).total_seconds()) / span
+
+    def fastest(self, limit=5):
+        rows = self._query(f'SELECT {COLUMNS} FROM games ORDER BY duration, id LIMIT ?', (limit,))
+        return [row_to_entry(r) for r in rows]
+
+    def import_top5(self, path):
+        """Import a top5.txt once; returns the number of imported games.
+
+        The file is remembered by its absolute path, later calls for the
+        same file do nothing.
+        """
+        source = os.path.abspath(path)
+        if not os.path.isfile(path) or self._query('SELECT 1 FROM imports WHERE source = ?', (source,)):
+            return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = parse_highscores(f)
+        rows = [(blocks, spent, user, f'{datum} {zeit}') for blocks, datum, zeit, spent, user in entries]
+        with self._lock, self._db:
+            self._insert(rows)
+            self._db.execute('INSERT INTO imports VALUES (?, ?, ?)', (source, timestamp(), len(rows)))
+        logging.debug(f'Imported {len(rows)} games from {path}')
+        return len(rows)
+
+
+def open_score_database(path):
+    """ScoreDatabase at path, or None (logged) if it cannot be opened."""
+    try:
+        return ScoreDatabase(path)
+    except sqlite3.Error as e:
+        logging.error(f'Error opening score database {path}: {e}')
+        return None
+
+
+class HighscoreStore:
+    """The top list in memory, persisted write-behind on a background thread.
+
+    With a ScoreDatabase every finished game is appended to it and the top
+    list comes from there (top5.txt at path is imported once); without one
+    the top list is kept in the text file at path.
+
+    version is incremented on every change, so callers can cache whatever
+    they derive from entries and rebuild it only when version moves on.
+    """
+
+    def __init__(self, path, limit=5, database=None):
+        self.path = path
+        self.limit = limit
+        self.database = database
+        try:
+            if database is not None:
+                database.import_top5(path)
+                self.entries = database.top(limit)
+            else:
+                self.entries = load_highscores(path, limit)
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f'Error reading highscores: {e}')
+            self.entries = []
+        self.version = 0
+        self._cond = threading.Condition()
+        self._pending = None
+        self._games = []
+        self._writing = False
+        self._thread = None
+
+    def add(self, blocks, spent, user=None, now=None):
+        """Record a finished game; returns its place (1-based) or None if it did not make the list."""
+        now = now or datetime.datetime.now()
+        user = user or getpass.getuser()
+        entry = (blocks, now.strftime('%Y-%m-%d'), now.strftime('%H:%M:%S'), spent, user)
+        entries = sorted(self.entries + [entry], key=lambda e: (e[0], e[3]))[:self.limit]
+        place = None
+        with self._cond:
+            if self.database is not None:
+                self._games.append((blocks, spent, user, timestamp(now)))
+            if entry in entries:
+                self.entries = entries
+                self.version += 1
+                place = entries.index(entry) + 1
+                if self.database is None:
+                    # Nur der neueste Stand wird geschrieben, ältere Snapshots verfallen
+                    self._pending = list(entries)
+            self._wake_writer()
+        return place
+
+    def _wake_writer(self):
+        if self._pending is None and not self._games:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._writer, name='highscore-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+        self._cond.notify_all()
+
+    def _idle(self):
+        return self._pending is None and not self._games and not self._writing
+
+    def _writer(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._games:
+                    self._cond.wait()
+                entries, self._pending = self._pending, None
+                games, self._games = self._games, []
+                self._writing = True
+            try:
+                if games:
+                    self.database.add_many(games)
+                if entries is not None:
+                    save_highscores(self.path, entries)
+                logging.debug(f'Saved {len(games)} games, {len(entries or ())} highscores')
+            except (OSError, sqlite3.Error) as e:
+                logging.error(f'Error writing highscores: {e}')
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+    def flush(self, timeout=5.0):
+        """Wait until all changes are on disk; returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(self._idle, timeout)
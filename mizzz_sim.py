@@ -0,0 +1,136 @@
+"""Command line simulator that plays many games to measure their outcomes.
+
+Plays many seeded games with a fixed move policy on all CPU cores and
+prints one JSON line per finished game on stdout, as soon as it is done,
+followed by a summary with histograms on stderr:
+
+    python mizzz_sim.py -games 1000 -policy greedy -size 10 -types 8 > games.jsonl
+
+A game starts from Board.generate() and ends when no move is left (game
+over) or after -maxmoves moves. Policies:
+
+    random  a random legal move
+    greedy  the move that clears the most blocks, cascades included
+    solver  Solver with -depth lookahead (and -budget ms per move)
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from mizzz_board import Board
+from mizzz_solver import Solver
+
+POLICIES = ('random', 'greedy', 'solver')
+HISTOGRAM_BINS = 10
+HISTOGRAM_WIDTH = 40
+
+
+def make_policy(name, seed, depth=2, budget=None):
+    """Return a function board -> move ([pos1, pos2] or None when no move is left)."""
+    if name == 'random':
+        rng = np.random.default_rng(seed)
+
+        def choose(board):
+            moves = list(board.legal_moves())
+            return list(moves[rng.integers(len(moves))]) if moves else None
+        return choose
+    if name in ('greedy', 'solver'):
+        solver = Solver(depth=1, samples=1) if name == 'greedy' else Solver(depth=depth)
+
+        def choose(board):
+            hint = solver.best_move(board, budget)
+            return hint.move if hint else None
+        return choose
+    raise ValueError(f'Unknown policy: {name}')
+
+
+def play_game(game, seed, size, num_types, policy, max_moves, min_moves=5, depth=2, budget=None):
+    """Play one game and return its result as a dict."""
+    start = time.perf_counter()
+    board = Board(size, num_types)
+    board.generate(min_moves, seed=(seed, game))
+    choose = make_policy(policy, (seed, game, 1), depth, budget)
+    moves = blocks = steps = max_cascade = 0
+    game_over = False
+    while moves < max_moves:
+        move = choose(board)
+        if move is None:
+            game_over = True
+            break
+        cascade = board.apply_move(*move)
+        moves += 1
+        blocks += sum(len(step.cleared) for step in cascade)
+        steps += len(cascade)
+        max_cascade = max(max_cascade, len(cascade))
+    return {'game': game, 'seed': seed, 'policy': policy, 'size': size, 'types': num_types,
+            'moves': moves, 'blocks': blocks, 'cascade_steps': steps, 'max_cascade': max_cascade,
+            'game_over': game_over, 'seconds': round(time.perf_counter() - start, 4)}
+
+
+def histogram(values, bins=HISTOGRAM_BINS, width=HISTOGRAM_WIDTH):
+    """Text histogram of integer values, one line per bin of equal width."""
+    values = np.asarray(values, dtype=np.int64)
+    lo, hi = int(values.min()), int(values.max())
+    step = max(1, -(-(hi - lo + 1) // bins))
+    counts = np.bincount((values - lo) // step)
+    scale = width / counts.max()
+    return [f'{lo + i * step:>8}-{lo + (i + 1) * step - 1:<8} | {"#" * int(round(count * scale)):<{width}} {count}'
+            for i, count in enumerate(counts.tolist())]
+
+
+def summary(results):
+    lines = [f'{len(results)} games, {sum(r["game_over"] for r in results)} ended without moves']
+    for key in ('moves', 'blocks', 'max_cascade', 'seconds'):
+        values = np.array([r[key] for r in results])
+        p10, p50, p90 = np.percentile(values, (10, 50, 90))
+        lines.append(f'{key}: mean {values.mean():.2f}, p10 {p10:g}, median {p50:g}, p90 {p90:g}, '
+                     f'min {values.min():g}, max {values.max():g}')
+        if key != 'seconds':
+            lines.extend(histogram(values))
+    return lines
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Mizzz Bloxxxx game simulator')
+    parser.add_argument('-games', type=int, default=100, help='Number of games')
+    parser.add_argument('-policy', choices=POLICIES, default='greedy', help='How moves are chosen')
+    parser.add_argument('-size', type=int, default=10, help='Board size (GRID_SIZE, at least 2)')
+    parser.add_argument('-types', type=int, default=8, help='Number of block types (3 to 127)')
+    parser.add_argument('-maxmoves', type=int, default=200, help='Stop a game after this many moves')
+    parser.add_argument('-minmoves', type=int, default=5, help='Minimum number of legal moves on a new board')
+    parser.add_argument('-depth', type=int, default=2, help='Lookahead of the solver policy')
+    parser.add_argument('-budget', type=float, help='Time per solver move in ms (default: no limit)')
+    parser.add_argument('-seed', type=int, default=0, help='Base seed; game i is played with (seed, i)')
+    parser.add_argument('-workers', type=int, help='Worker processes (default: all CPU cores)')
+    args = parser.parse_args(argv)
+    if args.size < 2:
+        parser.error('-size must be at least 2')
+    # Die Blocktypen stehen im int8-Grid des Boards
+    if not 3 <= args.types <= 127:
+        parser.error('-types must be between 3 and 127')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    budget = None if args.budget is None else args.budget / 1000
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers or os.cpu_count()) as pool:
+        jobs = [pool.submit(play_game, game, args.seed, args.size, args.types, args.policy,
+                            args.maxmoves, args.minmoves, args.depth, budget)
+                for game in range(args.games)]
+        for job in as_completed(jobs):
+            result = job.result()
+            results.append(result)
+            print(json.dumps(result), flush=True)
+    if results:
+        print('\n'.join(summary(results)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Move hints for the Tip button: a lookahead search and a worker thread.
+
+Solver rates the legal moves of a board by the number of blocks they are
+expected to clear, cascades included, looking depth moves ahead. The
+blocks that fall in after a match are random, so a move is played on a
+few copies of the board with differently seeded spawns and the results
+are averaged. The seeds are fixed, so a board always gets the same rating.
+
+best_move() deepens the search one move at a time until its time budget
+is used up and returns the best move of the deepest search so far. Every
+rating is kept in a transposition table, so asking again for the same
+board, or meeting a position twice within one search, costs nothing.
+
+HintWorker runs the search on a background thread, so the game loop
+only hands over a copy of the board and picks the hint up later.
+"""
+import collections
+import threading
+import time
+from collections import OrderedDict
+
+from mizzz_board import Board
+
+# move ist [pos1, pos2] wie bei Board.find_possible_move(), score die
+# erwartete Zahl gelöschter Blöcke (None, wenn nichts bewertet wurde)
+Hint = collections.namedtuple('Hint', 'move score depth')
+
+
+class _Timeout(Exception):
+    pass
+
+
+class Solver:
+    """Lookahead search over the moves of a Board.
+
+    At the root every move is played on `samples` copies; deeper down one
+    copy per move is enough, since the spawns there are guessed anyway.
+    The table holds at most max_entries ratings (least recently used ones
+    are dropped).
+    """
+
+    def __init__(self, depth=2, samples=4, seed=0, max_entries=100000):
+        self.depth = depth
+        self.samples = samples
+        self.seed = seed
+        self.max_entries = max_entries
+        self.table = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._deadline = None
+        self._cancel = None
+
+    def best_move(self, board, budget=0.1, cancel=None):
+        """Return the best Hint for board within budget seconds, or None if no move is possible.
+
+        With budget=None the search always runs to self.depth. Even with a
+        budget of 0 a legal move is returned, just not a rated one. Setting
+        the threading.Event cancel ends the search like an expired budget.
+        """
+        self._deadline = None if budget is None else time.perf_counter() + budget
+        self._cancel = cancel
+        grid = board.grid.copy()
+        moves = [[pos1, pos2] for pos1, pos2 in board.legal_moves()]
+        if not moves:
+            return None
+        best = Hint(moves[0], None, 0)
+        for depth in range(1, self.depth + 1):
+            rated = []
+            try:
+                for move in moves:
+                    rated.append((self._rate(grid, board.num_types, move, depth, self.samples), move))
+            except _Timeout:
+                # Der beste Zug der letzten Tiefe wird zuerst bewertet, also
+                # ist ein Teilergebnis der neuen Tiefe mindestens so gut
+                if rated:
+                    score, move = max(rated, key=lambda r: r[0])
+                    best = Hint(move, score, depth)
+                break
+            rated.sort(key=lambda r: r[0], reverse=True)
+            moves = [move for _, move in rated]
+            best = Hint(moves[0], rated[0][0], depth)
+        return best
+
+    def _rate(self, grid, num_types, move, depth, samples):
+        key = (grid.tobytes(), grid.shape[0], num_types, tuple(map(tuple, move)), depth, samples)
+        score = self.table.get(key)
+        if score is not None:
+            self.hits += 1
+            self.table.move_to_end(key)
+            return score
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise _Timeout()
+        if self._cancel is not None and self._cancel.is_set():
+            raise _Timeout()
+        self.misses += 1
+        total = 0
+        for sample in range(samples):
+            child = Board(grid.shape[0], num_types, seed=(self.seed, sample))
+            child.grid = grid.copy()
+            total += sum(len(step.cleared) for step in child.apply_move(*move))
+            if depth > 1:
+                total += max((self._rate(child.grid, num_types, next_move, depth - 1, 1)
+                              for next_move in child.legal_moves()), default=0)
+        score = total / samples
+        self.table[key] = score
+        if len(self.table) > self.max_entries:
+            self.table.popitem(last=False)
+        return score
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.table)}
+
+
+class HintWorker:
+    """Solver.best_move() on a background thread.
+
+    request() takes a copy of the board and returns at once. A newer
+    request replaces one that has not started yet and cancels one that is
+    running; cancelled searches are dropped. result() only returns a hint
+    while the board still has the grid it was computed for, so hints for
+    a board that has changed since are never shown. on_ready is called
+    from the worker thread when a hint is ready, e.g. to wake a loop that
+    sleeps in pygame.event.wait().
+    """
+
+    def __init__(self, solver, budget=0.1, on_ready=None):
+        self.solver = solver
+        self.budget = budget
+        self.on_ready = on_ready
+        self._cond = threading.Condition()
+        self._job = None
+        self._running = None
+        self._result = None
+        self._stop = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._worker, name='hints', daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        with self._cond:
+            self._stop = True
+            self._job = None
+            if self._running is not None:
+                self._running[1].set()
+            self._cond.notify_all()
+
+    def request(self, board):
+        """Search a hint for board unless that is already done or under way."""
+        key = board.grid.tobytes()
+        with self._cond:
+            running = self._running and not self._running[1].is_set() and self._running[0]
+            if key in (self._result and self._result[0], self._job and self._job[0], running):
+                return
+            snapshot = Board(board.size, board.num_types)
+            snapshot.grid = board.grid.copy()
+            self._job = (key, snapshot)
+            if self._running is not None:
+                self._running[1].set()
+            self._cond.notify_all()
+
+    def result(self, board):
+        """The Hint for board if it is ready (None also when board has no moves)."""
+        with self._cond:
+            if self._result is not None and self._result[0] == board.grid.tobytes():
+                return self._result[1]
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._job is None and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                (key, snapshot), self._job = self._job, None
+                cancel = threading.Event()
+                self._running = (key, cancel)
+            hint = self.solver.best_move(snapshot, self.budget, cancel)
+            with self._cond:
+                self._running = None
+                if cancel.is_set():
+                    continue
+                self._result = (key, hint)
+            if self.on_ready:
+                self.on_ready()
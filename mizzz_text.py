@@ -0,0 +1,50 @@
+"""Font lookup and a cache of rendered text surfaces.
+
+pygame.font.SysFont() searches the system fonts on every call, so fonts
+are created once per (name, size) by get_font(). TextCache keeps rendered
+labels in a bounded LRU: texts that do not change between frames cost a
+blit instead of a rasterization.
+"""
+from collections import OrderedDict
+
+import pygame
+
+_fonts = {}
+
+
+def get_font(name, size):
+    key = (name, size)
+    if key not in _fonts:
+        _fonts[key] = pygame.font.SysFont(name, size)
+    return _fonts[key]
+
+
+class TextCache:
+    """LRU of antialiased text surfaces keyed by (font, text, colour)."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return surf
+        self.misses += 1
+        surf = font.render(text, True, color)
+        self.entries[key] = surf
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surf
+
+    def render_shadowed(self, font, text, color=(255, 255, 255), shadow=(0, 0, 0)):
+        """Return the (shadow, label) surfaces for a text with drop shadow."""
+        return self.render(font, text, shadow), self.render(font, text, color)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries)}
@@ -0,0 +1,107 @@
+"""Saturation, brightness, contrast and colour tone adjustment on NumPy arrays.
+
+rgb_to_hsv() and hsv_to_rgb() are array versions of the colorsys functions
+of the same name and work on float arrays with the channels in the last
+axis. tint() applies the slider settings the same way the game always did.
+TintCache keeps the results for recently used slider positions.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+
+def rgb_to_hsv(rgb):
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    # np.maximum statt max(axis=-1): Reduktionen über 3 Kanäle sind sehr langsam
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    rangec = maxc - minc
+    grey = rangec == 0
+    safe_range = np.where(grey, 1, rangec)
+    s = np.where(grey, 0, rangec / np.where(maxc == 0, 1, maxc))
+    rc = (maxc - r) / safe_range
+    gc = (maxc - g) / safe_range
+    bc = (maxc - b) / safe_range
+    h = np.select([r == maxc, g == maxc], [bc - gc, 2.0 + rc - bc], 4.0 + gc - rc)
+    h = np.where(grey, 0, (h / 6.0) % 1.0)
+    return np.stack((h, s, maxc), axis=-1)
+
+
+HSV_SECTOR_OFFSETS = np.array([5.0, 3.0, 1.0], dtype=np.float32)
+
+
+def hsv_to_rgb(hsv):
+    # Geschlossene Form von colorsys.hsv_to_rgb, alle drei Kanäle auf einmal
+    h, s, v = hsv[..., 0:1], hsv[..., 1:2], hsv[..., 2:3]
+    k = (HSV_SECTOR_OFFSETS + h * 6.0) % 6.0
+    return v - v * s * np.clip(np.minimum(k, 4.0 - k), 0.0, 1.0)
+
+
+def tint(rgb, saturation, brightness, contrast, hue):
+    """Apply the slider settings (0..1, 0.5 = unchanged) to float RGB values in 0..1."""
+    rgb = np.clip(rgb + (brightness - 0.5) * 2, 0, 1)
+    s_adj = (saturation - 0.5) * 2
+    h_adj = (hue - 0.5) * 2
+    # Ohne Sättigungs-/Farbton-Änderung ist der HSV-Umweg die Identität
+    if s_adj or h_adj:
+        hsv = rgb_to_hsv(rgb)
+        hsv[..., 1] = np.clip(hsv[..., 1] + s_adj, 0, 1)
+        hsv[..., 0] = (hsv[..., 0] + h_adj) % 1.0
+        rgb = hsv_to_rgb(hsv)
+    c_adj = (contrast - 0.5) * 2
+    rgb = ((rgb - 0.5) * (c_adj + 1)) + 0.5
+    return np.clip(rgb, 0, 1)
+
+
+TINT_STEPS = 100
+
+
+def tint_key(saturation, brightness, contrast, hue, steps=TINT_STEPS):
+    """Quantize the four slider values into a hashable cache key."""
+    return tuple(int(round(v * steps)) for v in (saturation, brightness, contrast, hue))
+
+
+def key_values(key, steps=TINT_STEPS):
+    """The slider values a tint_key() stands for."""
+    return tuple(v / steps for v in key)
+
+
+class TintCache:
+    """LRU cache for tinted sprite sets and colour palettes, keyed by tint_key().
+
+    Entries are evicted, least recently used first, once there are more than
+    max_entries of them or their sizes add up to more than max_bytes.
+    """
+
+    def __init__(self, max_entries=32, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, create):
+        """Return the value for key, calling create(key) -> (value, nbytes) on a miss."""
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+        self.misses += 1
+        value, nbytes = create(key)
+        self.entries[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.nbytes > self.max_bytes):
+            _, (_, old_bytes) = self.entries.popitem(last=False)
+            self.nbytes -= old_bytes
+            self.evictions += 1
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self.entries), 'bytes': self.nbytes}